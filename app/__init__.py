@@ -16,15 +16,28 @@
 
 
 from flask import Flask
-from app.blueprints import blueprints
-from app.database import before_request, teardown_request, tables_create
 
 
+# Workers only serve: tables and migrations are applied once per deploy with python migrate.py, before the workers
+# start. The blueprints are imported here, so the CLI and the benchmarks importing app.database do not load them
 def app_create():
-    tables_create()
+    from app.blueprints import blueprints
+    from app.database import before_request, after_request, teardown_request, databases_close
+    from app.functions.json_provider import JSONProviderFast
+    from app.functions.metrics import metrics_start, metrics_finish
+    from app.functions.order_book import order_book_load
+    from app.functions.references import references_load
+
+    references_load()
+    order_book_load()
+    databases_close()
 
     app = Flask(__name__)
+    app.json = JSONProviderFast(app)
     [app.register_blueprint(blueprint) for blueprint in blueprints]
+    app.before_request(metrics_start)
     app.before_request(before_request)
+    app.after_request(after_request)
+    app.after_request(metrics_finish)
     app.teardown_request(teardown_request)
     return app
@@ -17,7 +17,8 @@
 
 from app.blueprints.account import blueprint_account
 from app.blueprints.errors import blueprint_errors
+from app.blueprints.metrics import blueprint_metrics
 from app.blueprints.pay import blueprint_pay
 
 
-blueprints = (blueprint_errors, blueprint_account, blueprint_pay)
+blueprints = (blueprint_errors, blueprint_account, blueprint_pay, blueprint_metrics)
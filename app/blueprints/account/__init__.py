@@ -18,10 +18,14 @@
 from datetime import datetime, timezone
 
 from flask import Blueprint
+from peewee import IntegrityError
 
-from app.database.account.models import Account, AccountSession, AccountActions, password_hash, token_create
-from app.functions.data_input import data_input, device_get
+from app.database.account.models import Account, AccountSession, AccountActions, password_hash, token_create, \
+    database_account
+from app.database.transaction import transaction, on_commit
+from app.functions.data_input import data_input, device_get, device_track
 from app.functions.data_output import data_output, ResponseStatus
+from config import PASSWORDS_ITERATIONS
 
 
 blueprint_account = Blueprint('blueprint_account', __name__, url_prefix='/account')
@@ -37,23 +41,14 @@ username_charset_allowed = '_-.' \
                            '0123456789'
 
 
-@blueprint_account.route('/create', endpoint='account_create', methods=('GET',))
-@data_input(schema={
-    'username': {'type': 'string', 'length_min': 8, 'length_max': 32, 'characters_allowed': username_charset_allowed},
-    'password': {'type': 'string', 'length_min': 8, 'length_max': 64, 'characters_allowed': password_charset_allowed},
-})
-def account_create(username: str, password: str):
-    username = username.lower()
-
-    account = Account.get_or_none(Account.username == username)
-    if account:
-        return data_output(
-            status=ResponseStatus.error,
-            message='This username is already taken',
-        )
+# The password is hashed outside of the transaction, with the connection given back to the pool, so a login storm
+# waiting on the hashing pool does not hold database connections. The transactions only cover the writes
+@transaction(database_account)
+def account_insert(username: str, password: str):
     account = Account(
         username=username,
-        password=password_hash(password=password),
+        password=password,
+        password_iterations=PASSWORDS_ITERATIONS,
         datetime=datetime.now(timezone.utc),
     )
     account.save()
@@ -70,6 +65,48 @@ def account_create(username: str, password: str):
         },
     )
 
+
+@transaction(database_account)
+def account_session_insert(account: Account, token: str):
+    account_session = AccountSession(account=account, token=token)
+    account_session.save()
+
+    # Written once the session is committed, the device references it
+    on_commit(lambda: device_track(account_session=account_session))
+
+    account.account_session = account_session
+
+    account.action_create(
+        action=AccountActions.account_token_create,
+    )
+
+
+@blueprint_account.route('/create', endpoint='account_create', methods=('GET',))
+@data_input(schema={
+    'username': {'type': 'string', 'length_min': 8, 'length_max': 32, 'characters_allowed': username_charset_allowed},
+    'password': {'type': 'string', 'length_min': 8, 'length_max': 64, 'characters_allowed': password_charset_allowed},
+})
+def account_create(username: str, password: str):
+    username = username.lower()
+
+    account = Account.get_or_none(Account.username == username)
+    if account:
+        return data_output(
+            status=ResponseStatus.error,
+            message='This username is already taken',
+        )
+    database_account.close()
+
+    password = password_hash(password=password)
+    try:
+        account_insert(username=username, password=password)
+    except IntegrityError:
+        # Taken by a concurrent request while the password was hashed
+        return data_output(
+            status=ResponseStatus.error,
+            message='This username is already taken',
+        )
+
     return data_output(
         status=ResponseStatus.successful,
     )
@@ -102,6 +139,8 @@ def account_session_create(username: str, password: str):
                 username=username,
             ),
         )
+    database_account.close()
+
     if not account.password_check(password=password):
         return data_output(
             status=ResponseStatus.error,
@@ -109,17 +148,7 @@ def account_session_create(username: str, password: str):
         )
 
     token = token_create()
-    account_session = AccountSession(account=account, token=token)
-    account_session.save()
-
-    account_session_device = device_get(account_session=account_session)
-    account_session_device.save()
-
-    account.account_session = account_session
-
-    account.action_create(
-        action=AccountActions.account_token_create,
-    )
+    account_session_insert(account=account, token=token)
 
     return data_output(
         status=ResponseStatus.successful,
@@ -20,6 +20,7 @@ from flask import Blueprint
 from werkzeug.exceptions import InternalServerError
 
 from app.functions.data_output import ResponseStatus, data_output
+from app.functions.passwords import PasswordsBusy
 
 
 blueprint_errors = Blueprint('blueprint_errors', __name__)
@@ -41,3 +42,11 @@ def errors_500(error: InternalServerError):
         message='An error has occurred on the server side. We have already found it and are solving it right now',
         error=error.description,
     )
+
+
+@blueprint_errors.app_errorhandler(PasswordsBusy)
+def errors_passwords_busy(error: PasswordsBusy):
+    return data_output(
+        status=ResponseStatus.error,
+        message='Too many sign-in attempts right now, please try again in a few seconds',
+    )
@@ -0,0 +1,28 @@
+#
+# (c) 2023, Yegor Yakubovich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+from flask import Blueprint, Response
+
+from app.functions.metrics import metrics_render
+
+
+blueprint_metrics = Blueprint('blueprint_metrics', __name__)
+
+
+@blueprint_metrics.route('/metrics', endpoint='metrics_get', methods=('GET',))
+def metrics_get():
+    return Response(metrics_render(), mimetype='text/plain; version=0.0.4')
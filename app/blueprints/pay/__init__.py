@@ -17,14 +17,20 @@
 
 from flask import Blueprint
 
+from app.blueprints.pay.book import blueprint_pay_book
 from app.blueprints.pay.currencies import blueprint_pay_currencies
+from app.blueprints.pay.offers import blueprint_pay_offers
 from app.blueprints.pay.systems import blueprint_pay_systems
 from app.blueprints.pay.wallet import blueprint_pay_wallet
+from app.blueprints.pay.wallet_batch import blueprint_pay_wallet_batch
+from app.blueprints.pay.wallet_deal import blueprint_pay_wallet_deal
 from app.blueprints.pay.wallet_offer import blueprint_pay_wallet_offer
 
 
 blueprint_pay = Blueprint('blueprint_pay', __name__, url_prefix='/pay')
-blueprints_pay = (blueprint_pay_wallet_offer, blueprint_pay_wallet, blueprint_pay_systems, blueprint_pay_currencies)
+blueprints_pay = (blueprint_pay_wallet_offer, blueprint_pay_wallet_deal, blueprint_pay_wallet_batch,
+                  blueprint_pay_wallet, blueprint_pay_systems, blueprint_pay_currencies, blueprint_pay_book,
+                  blueprint_pay_offers)
 
 
 [blueprint_pay.register_blueprint(blueprint) for blueprint in blueprints_pay]
@@ -0,0 +1,55 @@
+#
+# (c) 2023, Yegor Yakubovich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+from flask import Blueprint
+
+from app.database.pay.models import OfferType
+from app.functions.data_input import data_input
+from app.functions.data_output import data_output, ResponseStatus
+from app.functions.order_book import order_book_depth
+from app.functions.references import system_get
+from config import ORDER_BOOK_DEPTH, ORDER_BOOK_DEPTH_MAX
+
+
+blueprint_pay_book = Blueprint('blueprint_pay_book', __name__, url_prefix='/book')
+
+
+# Public quotes, served from the in-memory order book without a database query
+@blueprint_pay_book.route('/get', endpoint='pay_book_get', methods=('GET',))
+@data_input(schema={
+    'system_name': {'value_in': 'systems'},
+    'offer_type': {'value_in': [OfferType.input, OfferType.output]},
+    'depth': {'type': 'integer', 'optional': True},
+})
+def pay_book_get(system_name: str, offer_type: str, depth: int = None):
+    depth = ORDER_BOOK_DEPTH if depth is None else depth
+    if not 1 <= depth <= ORDER_BOOK_DEPTH_MAX:
+        return data_output(
+            status=ResponseStatus.error,
+            message='depth must be between 1 and {depth_max}'.format(depth_max=ORDER_BOOK_DEPTH_MAX),
+        )
+
+    system = system_get(name=system_name)
+    levels = order_book_depth(system_id=system.id, offer_type=offer_type, levels=depth)
+
+    return data_output(
+        status=ResponseStatus.successful,
+        system_name=system.name,
+        offer_type=offer_type,
+        rate_best=levels[0]['rate'] if levels else None,
+        depth=levels,
+    )
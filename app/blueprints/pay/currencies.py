@@ -17,9 +17,9 @@
 
 from flask import Blueprint
 
-from app.database.pay.models import Currency
 from app.functions.data_input import data_input
-from app.functions.data_output import data_output, ResponseStatus
+from app.functions.data_output import data_output, data_output_etag, ResponseStatus
+from app.functions.references import currencies_get, currencies_etag
 
 
 blueprint_pay_currencies = Blueprint('blueprint_pay_currencies', __name__, url_prefix='/currencies')
@@ -28,16 +28,19 @@ blueprint_pay_currencies = Blueprint('blueprint_pay_currencies', __name__, url_p
 @blueprint_pay_currencies.route('/get', endpoint='pay_currencies_get', methods=('GET',))
 @data_input(schema={})
 def pay_currencies_get():
-    currencies = [
-        {
-            'name': currency.name,
-            'description': currency.description,
-            'icon': currency.icon,
-            'places_decimal': currency.places_decimal,
-        } for currency in Currency.select()
-    ]
-
-    return data_output(
-        status=ResponseStatus.successful,
-        currencies=currencies,
-    )
+    def output():
+        currencies = [
+            {
+                'name': currency.name,
+                'description': currency.description,
+                'icon': currency.icon,
+                'places_decimal': currency.places_decimal,
+            } for currency in currencies_get()
+        ]
+
+        return data_output(
+            status=ResponseStatus.successful,
+            currencies=currencies,
+        )
+
+    return data_output_etag(etag=currencies_etag(), output=output)
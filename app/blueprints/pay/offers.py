@@ -0,0 +1,122 @@
+#
+# (c) 2023, Yegor Yakubovich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+from heapq import merge
+
+from flask import Blueprint
+
+from app.database.pay.models import OfferType, Offer, Currency
+from app.functions.cache import cache_offers_search
+from app.functions.data_input import data_input
+from app.functions.data_output import data_output, ResponseStatus
+from app.functions.order_book import rates_highest_best
+from app.functions.pagination import cursor_rate_create, limit_get
+from app.functions.references import system_get, systems_get
+
+
+blueprint_pay_offers = Blueprint('blueprint_pay_offers', __name__, url_prefix='/offers')
+
+
+# One query per system, each one an index range scan of (system, type, active, deleted, rate, id) with a limit.
+# The pages are merged by rate here, an IN over the systems would make the database sort every matching offer
+def offers_search(systems: list, offer_type: str, value: int = None, after: tuple = None, limit: int = None):
+    highest_best = rates_highest_best[offer_type]
+    order = (Offer.rate.desc(), Offer.id.desc()) if highest_best else (Offer.rate, Offer.id)
+    pages = []
+    for system in systems:
+        query = Offer.select(
+            Offer.id, Offer.system, Offer.type, Offer.value_from, Offer.value_to, Offer.rate, Offer.updated_datetime,
+        ).where(
+            (Offer.system == system) &
+            (Offer.type == offer_type) &
+            (Offer.active == True) &
+            (Offer.deleted == False)
+        )
+        if value is not None:
+            query = query.where((Offer.value_from <= value) & (Offer.value_to >= value))
+        if after:
+            rate, id_ = after
+            if highest_best:
+                query = query.where((Offer.rate < rate) | ((Offer.rate == rate) & (Offer.id < id_)))
+            else:
+                query = query.where((Offer.rate > rate) | ((Offer.rate == rate) & (Offer.id > id_)))
+        pages.append(list(query.order_by(*order).limit(limit + 1)))
+
+    offers = list(merge(
+        *pages,
+        key=lambda offer: (offer.rate, offer.id),
+        reverse=highest_best,
+    ))[:limit + 1]
+    if len(offers) <= limit:
+        return offers, None
+    offers = offers[:limit]
+    return offers, cursor_rate_create(rate=offers[-1].rate, id_=offers[-1].id)
+
+
+@blueprint_pay_offers.route('/search', endpoint='pay_offers_search', methods=('GET',))
+@data_input(schema={
+    'currency': {},
+    'offer_type': {'value_in': [OfferType.input, OfferType.output]},
+    'system_name': {'value_in': 'systems', 'optional': True},
+    'value': {'type': 'integer', 'optional': True},
+    'after': {'type': 'cursor_rate', 'optional': True},
+    'limit': {'type': 'integer', 'optional': True},
+})
+def pay_offers_search(currency: Currency, offer_type: str, system_name: str = None, value: int = None,
+                      after: tuple = None, limit: int = None):
+    limit = limit_get(limit=limit)
+    # Results of the same filters are shared by all workers for a few seconds
+    cache_key = ':'.join(str(key) for key in (currency.id, offer_type, system_name, value, after, limit))
+    output = cache_offers_search.get(cache_key)
+    if output is None:
+        if system_name:
+            system = system_get(name=system_name)
+            if system.currency_id != currency.id:
+                return data_output(
+                    status=ResponseStatus.error,
+                    message='System {system_name} does not belong to the currency {currency}'.format(
+                        system_name=system_name,
+                        currency=currency.name,
+                    ),
+                )
+            systems = [system]
+        else:
+            systems = systems_get(currency=currency)
+
+        systems_by_id = {system.id: system for system in systems}
+        offers, after = offers_search(systems=systems, offer_type=offer_type, value=value, after=after, limit=limit)
+        output = {
+            'after': after,
+            'offers': [
+                {
+                    'id': offer.id,
+                    'type': offer.type,
+                    'system': systems_by_id[offer.system_id].name,
+                    'currency': currency.name,
+                    'value_from': offer.value_from,
+                    'value_to': offer.value_to,
+                    'rate': offer.rate,
+                    'updated_datetime': offer.updated_datetime.isoformat(),
+                } for offer in offers
+            ],
+        }
+        cache_offers_search.set(cache_key, output)
+
+    return data_output(
+        status=ResponseStatus.successful,
+        **output,
+    )
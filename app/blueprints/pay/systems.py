@@ -24,7 +24,8 @@ from app.database.account.models import AccountActions
 from app.database.pay import Wallet
 from app.database.pay.models import WalletActions, WalletAction, Offer, Currency, System
 from app.functions.data_input import data_input
-from app.functions.data_output import data_output, ResponseStatus
+from app.functions.data_output import data_output, data_output_etag, ResponseStatus
+from app.functions.references import systems_get, systems_etag
 
 
 blueprint_pay_systems = Blueprint('blueprint_pay_systems', __name__, url_prefix='/systems')
@@ -35,15 +36,18 @@ blueprint_pay_systems = Blueprint('blueprint_pay_systems', __name__, url_prefix=
     'currency': {},
 })
 def pay_systems_get(currency: Currency):
-    systems = [
-        {
-            'name': system.name,
-            'description': system.description,
-            'data': loads(system.data),
-        } for system in System.select().where(System.currency == currency)
-    ]
-
-    return data_output(
-        status=ResponseStatus.successful,
-        systems=systems,
-    )
+    def output():
+        systems = [
+            {
+                'name': system.name,
+                'description': system.description,
+                'data': loads(system.data),
+            } for system in systems_get(currency=currency)
+        ]
+
+        return data_output(
+            status=ResponseStatus.successful,
+            systems=systems,
+        )
+
+    return data_output_etag(etag=systems_etag(currency=currency), output=output)
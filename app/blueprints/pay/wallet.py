@@ -15,16 +15,23 @@
 #
 
 
-from json import loads
+from datetime import datetime
+from json import dumps, loads
+from zlib import compressobj
 
-from flask import Blueprint
+from flask import Blueprint, Response, stream_with_context
 
+from app.blueprints.pay.wallet_offer import offers_select, offer_output
 from app.database.account import Account
-from app.database.account.models import AccountActions
+from app.database.account.models import AccountActions, database_account
+from app.database.archive import actions_paginate, actions_iterate
 from app.database.pay import Wallet
-from app.database.pay.models import WalletActions, WalletAction, Offer
+from app.database.pay.models import WalletActions, WalletAction, Offer, database_pay
+from app.database.transaction import transaction
 from app.functions.data_input import data_input
 from app.functions.data_output import data_output, ResponseStatus
+from app.functions.pagination import paginate
+from config import EXPORT_CHUNK
 
 
 blueprint_pay_wallet = Blueprint('blueprint_pay_wallet', __name__, url_prefix='/wallet')
@@ -34,6 +41,7 @@ blueprint_pay_wallet = Blueprint('blueprint_pay_wallet', __name__, url_prefix='/
 @data_input(schema={
     'account_session_token': {'account': True},
 })
+@transaction(database_account, database_pay)
 def pay_wallet_create(account: Account):
     wallet = Wallet.get_or_none(Wallet.account_id == account.id)
     if wallet:
@@ -80,51 +88,99 @@ def pay_wallet_get(wallet: Wallet):
 @blueprint_pay_wallet.route('/actions/get', endpoint='pay_wallet_actions_get', methods=('GET',))
 @data_input(schema={
     'account_session_token': {'wallet': True},
-    'page': {'type': 'integer'},
+    'page': {'type': 'integer', 'optional': True},
+    'after': {'type': 'cursor_actions', 'optional': True},
+    'limit': {'type': 'integer', 'optional': True},
 })
-def pay_wallet_actions_get(wallet: Wallet, page: int):
+def pay_wallet_actions_get(wallet: Wallet, page: int = None, after=None, limit: int = None):
+    wallet_actions, after = actions_paginate(
+        model=WalletAction,
+        owner_field=WalletAction.wallet,
+        owner_id=wallet.id,
+        page=page,
+        after=after,
+        limit=limit,
+    )
     wallet_actions = [
         {
             'action': wa.action,
             'data': loads(wa.data),
             'datetime': wa.datetime,
-        } for wa in WalletAction.select().where(WalletAction.wallet == wallet).limit(10).offset(10 * page - 10)
+        } for wa in wallet_actions
     ]
     return data_output(
         status=ResponseStatus.successful,
         page=page,
+        after=after,
         wallet_actions=wallet_actions,
     )
 
 
+# The whole history as NDJSON, one action per line in id order, streamed while it is read in chunks of EXPORT_CHUNK
+# rows. data is copied into the line as stored, it is already JSON
+@blueprint_pay_wallet.route('/actions/export', endpoint='pay_wallet_actions_export', methods=('GET',))
+@data_input(schema={
+    'account_session_token': {'wallet': True},
+    'since': {'type': 'datetime', 'optional': True},
+    'gzip': {'type': 'boolean', 'optional': True},
+})
+def pay_wallet_actions_export(wallet: Wallet, since: datetime = None, gzip: bool = False):
+    def lines():
+        buffer = []
+        for id_, action, data, datetime_ in actions_iterate(
+            model=WalletAction,
+            owner_field=WalletAction.wallet,
+            owner_id=wallet.id,
+            since=since,
+            chunk=EXPORT_CHUNK,
+        ):
+            buffer.append('{{"id": {id}, "action": {action}, "data": {data}, "datetime": "{datetime}"}}\n'.format(
+                id=id_,
+                action=dumps(action),
+                data=data,
+                datetime=datetime_.isoformat(),
+            ))
+            if len(buffer) == EXPORT_CHUNK:
+                yield ''.join(buffer).encode()
+                buffer = []
+        if buffer:
+            yield ''.join(buffer).encode()
+
+    def lines_gzip():
+        compressor = compressobj(wbits=31)
+        for chunk in lines():
+            chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+        yield compressor.flush()
+
+    headers = {'Content-Encoding': 'gzip'} if gzip else {}
+    return Response(
+        stream_with_context(lines_gzip() if gzip else lines()),
+        mimetype='application/x-ndjson',
+        headers=headers,
+    )
+
+
 @blueprint_pay_wallet.route('/offers/get', endpoint='pay_wallet_offers_get', methods=('GET',))
 @data_input(schema={
     'account_session_token': {'wallet': True},
-    'page': {'type': 'integer'},
+    'page': {'type': 'integer', 'optional': True},
+    'after': {'type': 'cursor', 'optional': True},
+    'limit': {'type': 'integer', 'optional': True},
 })
-def pay_wallet_offers_get(wallet: Wallet, page: int):
-    wallet_offers = [
-        {
-            'id': wo.id,
-            'type': wo.type,
-            'system': {
-                'currency': {
-                    'name': wo.system.currency.name,
-                    'description': wo.system.currency.description,
-                },
-                'name': wo.system.name,
-                'description': wo.system.description,
-            },
-            'value_from': wo.value_from,
-            'value_to': wo.value_to,
-            'rate': wo.rate,
-            'updated_datetime': wo.updated_datetime,
-            'active': wo.active,
-        } for wo in Offer.select().where((Offer.wallet == wallet) &
-                                         (Offer.deleted == False)).limit(10).offset(10 * page - 10)
-    ]
+def pay_wallet_offers_get(wallet: Wallet, page: int = None, after: int = None, limit: int = None):
+    wallet_offers, after = paginate(
+        query=offers_select().where((Offer.wallet == wallet) & (Offer.deleted == False)),
+        field=Offer.id,
+        page=page,
+        after=after,
+        limit=limit,
+    )
+    wallet_offers = [offer_output(offer=offer) for offer in wallet_offers]
     return data_output(
         status=ResponseStatus.successful,
         page=page,
+        after=after,
         wallet_offers=wallet_offers,
     )
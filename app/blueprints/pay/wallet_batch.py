@@ -0,0 +1,111 @@
+#
+# (c) 2023, Yegor Yakubovich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+from flask import Blueprint
+
+from app.blueprints.pay.wallet_offer import schema_offer_update, schema_offer_delete, offer_update, offer_delete, \
+    offer_fields_owner, offers_value_to_read
+from app.database.pay import Wallet
+from app.database.pay.models import Offer, database_pay
+from app.database.transaction import transaction, on_commit
+from app.functions.data_input import data_input, data_validate, schema_compile
+from app.functions.data_output import data_output, ResponseStatus
+from app.functions.order_book import order_book_update
+from config import BATCH_OPERATIONS_MAX
+
+
+blueprint_pay_wallet_batch = Blueprint('blueprint_pay_wallet_batch', __name__, url_prefix='/wallet/batch')
+
+
+def schema_operation(schema: dict):
+    return schema_compile(schema={key: value for key, value in schema.items() if key != 'account_session_token'})
+
+
+# Operation name -> (compiled schema of the endpoint without the token, function changing the loaded offer)
+operations_offer = {
+    'offer_update': (schema_operation(schema=schema_offer_update), offer_update),
+    'offer_delete': (schema_operation(schema=schema_offer_delete), offer_delete),
+}
+
+
+# Operations are validated like their endpoints and answered one by one in results, in the same order. The token
+# is resolved once, the offers are loaded with one SELECT, written with one bulk UPDATE and their actions with one
+# INSERT, all in one transaction
+@blueprint_pay_wallet_batch.route('/execute', endpoint='pay_wallet_batch_execute', methods=('GET',))
+@data_input(schema={
+    'account_session_token': {'wallet': True},
+    'operations': {'type': 'list'},
+})
+@transaction(database_pay)
+def pay_wallet_batch_execute(wallet: Wallet, operations: list):
+    if not 1 <= len(operations) <= BATCH_OPERATIONS_MAX:
+        return data_output(
+            status=ResponseStatus.error,
+            message='operations must contain from 1 to {operations_max} items'.format(
+                operations_max=BATCH_OPERATIONS_MAX,
+            ),
+        )
+
+    results = [None] * len(operations)
+    operations_valid = []
+    for number, operation in enumerate(operations):
+        name = operation.get('operation') if isinstance(operation, dict) else None
+        if name not in operations_offer:
+            results[number] = data_output(
+                status=ResponseStatus.error,
+                message='operation must be from the list {operations}'.format(operations=list(operations_offer)),
+            )
+            continue
+        (schema_steps, keys_required), function = operations_offer[name]
+        data, error = data_validate(schema_steps=schema_steps, keys_required=keys_required, values=operation)
+        if error:
+            results[number] = error
+            continue
+        operations_valid.append((number, function, data))
+
+    offers_ids = {data['offer_id'] for _, _, data in operations_valid}
+    offers = {
+        offer.id: offer for offer in Offer.select().where((Offer.wallet == wallet) &
+                                                          (Offer.id.in_(offers_ids)) &
+                                                          (Offer.deleted == False))
+    } if offers_ids else {}
+
+    offers_changed = {}
+    for number, function, data in operations_valid:
+        offer = offers.get(data.pop('offer_id'))
+        if not offer or offer.deleted:
+            results[number] = data_output(
+                status=ResponseStatus.error,
+                message='This offer does not exist',
+            )
+            continue
+        function(wallet=wallet, offer=offer, **data)
+        offers_changed[offer.id] = offer
+        results[number] = data_output(
+            status=ResponseStatus.successful,
+        )
+
+    if offers_changed:
+        Offer.bulk_update(list(offers_changed.values()), fields=offer_fields_owner, batch_size=BATCH_OPERATIONS_MAX)
+        offers_value_to_read(offers=list(offers_changed.values()))
+        for offer in offers_changed.values():
+            on_commit(lambda offer=offer: order_book_update(offer=offer))
+
+    return data_output(
+        status=ResponseStatus.successful,
+        results=results,
+    )
@@ -0,0 +1,62 @@
+#
+# (c) 2023, Yegor Yakubovich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+from flask import Blueprint
+
+from app.database.pay import Wallet
+from app.database.pay.models import OfferType
+from app.functions.data_input import data_input
+from app.functions.data_output import data_output, ResponseStatus
+from app.functions.deals import deal_create
+from app.functions.references import system_get
+
+
+blueprint_pay_wallet_deal = Blueprint('blueprint_pay_wallet_deal', __name__, url_prefix='/wallet/deal')
+
+
+# Not wrapped in @transaction, deal_create() commits every attempt on its own
+@blueprint_pay_wallet_deal.route('/create', endpoint='pay_wallet_deal_create', methods=('GET',))
+@data_input(schema={
+    'account_session_token': {'wallet': True},
+    'system_name': {'value_in': 'systems'},
+    'offer_type': {'value_in': [OfferType.input, OfferType.output]},
+    'value': {'type': 'integer'},
+})
+def pay_wallet_deal_create(wallet: Wallet, system_name: str, offer_type: str, value: int):
+    if value < 1:
+        return data_output(
+            status=ResponseStatus.error,
+            message='value must be greater than 0',
+        )
+
+    system = system_get(name=system_name)
+    deal = deal_create(wallet=wallet, system_id=system.id, offer_type=offer_type, value=value)
+    if not deal:
+        return data_output(
+            status=ResponseStatus.error,
+            message='There are no offers for this value right now, please try again later',
+        )
+
+    return data_output(
+        status=ResponseStatus.successful,
+        deal={
+            'id': deal.id,
+            'offer_id': deal.offer_id,
+            'value': deal.value,
+            'rate': deal.rate,
+        },
+    )
@@ -21,14 +21,59 @@ from json import dumps, loads
 from flask import Blueprint
 
 from app.database.pay import Wallet
-from app.database.pay.models import OfferType, System, Offer, OfferActions, WalletActions
+from app.database.pay.models import OfferType, System, Offer, OfferActions, WalletActions, Currency, database_pay
+from app.database.transaction import transaction, on_commit
 from app.functions.data_input import data_input
 from app.functions.data_output import data_output, ResponseStatus
+from app.functions.order_book import order_book_update
+from app.functions.references import system_get
 
 
 blueprint_pay_wallet_offer = Blueprint('blueprint_pay_wallet_offer', __name__, url_prefix='/wallet/offer')
 
 
+# Offers are always loaded together with their system and currency, one query instead of 1 + 2 per offer
+def offers_select():
+    return Offer.select(Offer, System, Currency).join(System).join(Currency)
+
+
+# Columns changed by the owner, value_to is decremented concurrently by deals (Offer.value_reserve) and is never
+# written back from an instance
+offer_fields_owner = [Offer.system_data, Offer.rate, Offer.active, Offer.deleted, Offer.updated_datetime]
+
+
+# The rows stay locked by the UPDATE of the owner until the commit, so value_to read back is the one the order book
+# must get
+def offers_value_to_read(offers: list):
+    offers_ids = [offer.id for offer in offers]
+    values_to = dict(Offer.select(Offer.id, Offer.value_to).where(Offer.id.in_(offers_ids)).tuples())
+    for offer in offers:
+        offer.value_to = values_to[offer.id]
+
+
+def offer_output(offer: Offer, system_data: bool = False):
+    system = {
+        'currency': {
+            'name': offer.system.currency.name,
+            'description': offer.system.currency.description,
+        },
+        'name': offer.system.name,
+        'description': offer.system.description,
+    }
+    if system_data:
+        system['data'] = offer.system_data
+    return {
+        'id': offer.id,
+        'type': offer.type,
+        'system': system,
+        'value_from': offer.value_from,
+        'value_to': offer.value_to,
+        'rate': offer.rate,
+        'updated_datetime': offer.updated_datetime,
+        'active': offer.active,
+    }
+
+
 @blueprint_pay_wallet_offer.route('/create', endpoint='pay_wallet_offer_create', methods=('GET',))
 @data_input(schema={
     'account_session_token': {'wallet': True},
@@ -39,6 +84,7 @@ blueprint_pay_wallet_offer = Blueprint('blueprint_pay_wallet_offer', __name__, u
     'value_to': {'type': 'integer'},
     'rate': {'type': 'integer'},
 })
+@transaction(database_pay)
 def pay_wallet_offer_create(wallet: Wallet, offer_type: str, system_name: str, system_data: dict,
                             value_from: int, value_to: int, rate: int):
     if value_from < 1000 or value_to > 10000000:
@@ -47,17 +93,9 @@ def pay_wallet_offer_create(wallet: Wallet, offer_type: str, system_name: str, s
             message='value_from must not be less than 1000 and value_to must be greater than 10000000',
         )
     if wallet.balance < value_to:
-        return data_output(
-            status=ResponseStatus.error,
-            message='The amount in your wallet must be greater than or equal to {value_to}. '
-                    'We will freeze this amount and return it when you cancel the offer '
-                    'to be sure that you are not a scammer. Your balance: {wallet_balance}'.format(
-                value_to=value_to,
-                wallet_balance=wallet.balance,
-            ),
-        )
+        return pay_wallet_offer_balance_error(wallet=wallet, value_to=value_to)
 
-    system = System.get(System.name == system_name)
+    system = system_get(name=system_name)
     system_data_required = loads(system.data)
     for data in system_data_required:
         if data['name'] not in system_data.keys():
@@ -66,6 +104,10 @@ def pay_wallet_offer_create(wallet: Wallet, offer_type: str, system_name: str, s
                 message='system_data must include the key {key}'.format(key=data['name']),
             )
 
+    wallet_balance = wallet.balance_freeze(value=value_to)
+    if not wallet_balance.applied:
+        return pay_wallet_offer_balance_error(wallet=wallet, value_to=value_to)
+
     offer = Offer(
         wallet=wallet,
         type=offer_type,
@@ -77,6 +119,7 @@ def pay_wallet_offer_create(wallet: Wallet, offer_type: str, system_name: str, s
         updated_datetime=datetime.now(timezone.utc),
     )
     offer.save()
+    on_commit(lambda: order_book_update(offer=offer))
 
     offer.account_session = wallet.account_session
 
@@ -98,20 +141,16 @@ def pay_wallet_offer_create(wallet: Wallet, offer_type: str, system_name: str, s
         },
     )
 
-    wallet.balance -= value_to
-    wallet.balance_frozen += value_to
-    wallet.save()
-
     wallet.action_create(
         action=WalletActions.balance_frozen,
         data={
             'reason': WalletActions.offer_create,
             'offer_id': offer.id,
-            'balance_before': wallet.balance + value_to,
-            'balance_frozen_before': wallet.balance_frozen - value_to,
+            'balance_before': wallet_balance.balance + value_to,
+            'balance_frozen_before': wallet_balance.balance_frozen - value_to,
             'frozen': value_to,
-            'balance': wallet.balance,
-            'balance_frozen': wallet.balance_frozen,
+            'balance': wallet_balance.balance,
+            'balance_frozen': wallet_balance.balance_frozen,
         },
     )
 
@@ -120,6 +159,18 @@ def pay_wallet_offer_create(wallet: Wallet, offer_type: str, system_name: str, s
     )
 
 
+def pay_wallet_offer_balance_error(wallet: Wallet, value_to: int):
+    return data_output(
+        status=ResponseStatus.error,
+        message='The amount in your wallet must be greater than or equal to {value_to}. '
+                'We will freeze this amount and return it when you cancel the offer '
+                'to be sure that you are not a scammer. Your balance: {wallet_balance}'.format(
+            value_to=value_to,
+            wallet_balance=wallet.balance,
+        ),
+    )
+
+
 @blueprint_pay_wallet_offer.route('/get', endpoint='pay_wallet_offer_get', methods=('GET',))
 @data_input(schema={
     'account_session_token': {'wallet': True},
@@ -129,9 +180,9 @@ def pay_wallet_offer_create(wallet: Wallet, offer_type: str, system_name: str, s
     'active': {'type': 'boolean', 'optional': True},
 })
 def pay_wallet_offer_get(wallet: Wallet, offer_id: int):
-    offer = Offer.get_or_none((Offer.wallet == wallet) &
-                              (Offer.id == offer_id) &
-                              (Offer.deleted == False))
+    offer = offers_select().where((Offer.wallet == wallet) &
+                                  (Offer.id == offer_id) &
+                                  (Offer.deleted == False)).get_or_none()
     if not offer:
         return data_output(
             status=ResponseStatus.error,
@@ -140,35 +191,27 @@ def pay_wallet_offer_get(wallet: Wallet, offer_id: int):
 
     return data_output(
         status=ResponseStatus.successful,
-        offer={
-            'id': offer.id,
-            'type': offer.type,
-            'system': {
-                'currency': {
-                    'name': offer.system.currency.name,
-                    'description': offer.system.currency.description,
-                },
-                'name': offer.system.name,
-                'description': offer.system.description,
-                'data': offer.system_data,
-            },
-            'value_from': offer.value_from,
-            'value_to': offer.value_to,
-            'rate': offer.rate,
-            'updated_datetime': offer.updated_datetime,
-            'active': offer.active,
-        }
+        offer=offer_output(offer=offer, system_data=True),
     )
 
 
-@blueprint_pay_wallet_offer.route('/update', endpoint='pay_wallet_offer_update', methods=('GET',))
-@data_input(schema={
+# Shared with the batch endpoint, see wallet_batch.py
+schema_offer_update = {
     'account_session_token': {'wallet': True},
     'offer_id': {'type': 'integer'},
     'system_data': {'type': 'dictionary', 'optional': True},
     'rate': {'type': 'integer', 'optional': True},
     'active': {'type': 'boolean', 'optional': True},
-})
+}
+schema_offer_delete = {
+    'account_session_token': {'wallet': True},
+    'offer_id': {'type': 'integer'},
+}
+
+
+@blueprint_pay_wallet_offer.route('/update', endpoint='pay_wallet_offer_update', methods=('GET',))
+@data_input(schema=schema_offer_update)
+@transaction(database_pay)
 def pay_wallet_offer_update(wallet: Wallet, offer_id: int,
                             system_data: dict = None, rate: int = None, active: bool = None):
     offer = Offer.get_or_none((Offer.wallet == wallet) &
@@ -180,11 +223,22 @@ def pay_wallet_offer_update(wallet: Wallet, offer_id: int,
             message='This offer does not exist',
         )
 
+    offer_update(wallet=wallet, offer=offer, system_data=system_data, rate=rate, active=active)
+    offer.save(only=offer_fields_owner)
+    offers_value_to_read(offers=[offer])
+    on_commit(lambda: order_book_update(offer=offer))
+
+    return data_output(
+        status=ResponseStatus.successful,
+    )
+
+
+# Changes the instance and records the action, saving is left to the caller
+def offer_update(wallet: Wallet, offer: Offer, system_data: dict = None, rate: int = None, active: bool = None):
     offer.system_data = offer.system_data if system_data is None else dumps(system_data)
     offer.rate = offer.rate if rate is None else rate
     offer.active = offer.active if active is None else active
     offer.updated_datetime = datetime.now(timezone.utc)
-    offer.save()
 
     offer.account_session = wallet.account_session
 
@@ -197,16 +251,10 @@ def pay_wallet_offer_update(wallet: Wallet, offer_id: int,
         },
     )
 
-    return data_output(
-        status=ResponseStatus.successful,
-    )
-
 
 @blueprint_pay_wallet_offer.route('/delete', endpoint='pay_wallet_offer_delete', methods=('GET',))
-@data_input(schema={
-    'account_session_token': {'wallet': True},
-    'offer_id': {'type': 'integer'},
-})
+@data_input(schema=schema_offer_delete)
+@transaction(database_pay)
 def pay_wallet_offer_delete(wallet: Wallet, offer_id: int):
     offer = Offer.get_or_none((Offer.wallet == wallet) &
                               (Offer.id == offer_id) &
@@ -217,16 +265,22 @@ def pay_wallet_offer_delete(wallet: Wallet, offer_id: int):
             message='This offer does not exist',
         )
 
+    offer_delete(wallet=wallet, offer=offer)
+    offer.save(only=offer_fields_owner)
+    offers_value_to_read(offers=[offer])
+    on_commit(lambda: order_book_update(offer=offer))
+
+    return data_output(
+        status=ResponseStatus.successful,
+    )
+
+
+def offer_delete(wallet: Wallet, offer: Offer):
     offer.deleted = True
     offer.updated_datetime = datetime.now(timezone.utc)
-    offer.save()
 
     offer.account_session = wallet.account_session
 
     offer.action_create(
         action=OfferActions.delete,
     )
-
-    return data_output(
-        status=ResponseStatus.successful,
-    )
@@ -16,6 +16,7 @@
 
 
 from app.database.account import models_account
+from app.database.instrumentation import queries_start, queries_finish
 from app.database.account.models import database_account
 from app.database.pay import models_pay
 from app.database.pay.models import database_pay
@@ -33,9 +34,12 @@ models = [
 
 
 def before_request():
-    for db in databases:
-        if db.is_closed():
-            db.connect()
+    # Connections are checked out from the pools on the first query, only for the databases the request uses
+    queries_start()
+
+
+def after_request(response):
+    return queries_finish(response)
 
 
 def teardown_request(arg=None):
@@ -44,9 +48,20 @@ def teardown_request(arg=None):
             db.close()
 
 
+def databases_stats():
+    return [db.stats() for db in databases]
+
+
 def tables_create():
-    before_request()
+    # Only missing tables are created as declared, existing tables are changed by the migrations alone
     for model in models:
         for num, m in enumerate(model):
-            model[num].create_table()
+            if not model[num].table_exists():
+                model[num].create_table()
     teardown_request()
+
+
+def databases_close():
+    # Do not hand connections opened in the master process over to forked workers
+    for db in databases:
+        db.close_all()
@@ -16,34 +16,26 @@
 
 
 from datetime import datetime, timezone
-from hashlib import pbkdf2_hmac
+from hmac import compare_digest
 from json import dumps
 from secrets import token_hex
 
-from peewee import MySQLDatabase, Model, PrimaryKeyField, CharField, DateTimeField, ForeignKeyField, BooleanField
+from peewee import DatabaseProxy, Model, PrimaryKeyField, CharField, DateTimeField, ForeignKeyField, BooleanField, \
+    IntegerField
 
-from config import DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, SALT_PASSWORDS
+from app.database.pool import database_create
+from app.database.transaction import action_add
+from app.functions.cache import cache_sessions
+from app.functions.passwords import passwords_pool
+from config import PASSWORDS_ITERATIONS
 
 
-database_account = MySQLDatabase(
-    database='adecty_account',
-    user=DB_USER,
-    password=DB_PASSWORD,
-    host=DB_HOST,
-    port=DB_PORT,
-    charset='utf8mb4',
-    autoconnect=False,
-)
+database_account = DatabaseProxy()
+database_account.initialize(database_create(name='adecty_account'))
 
 
-def password_hash(password: str):
-    password = pbkdf2_hmac(
-        hash_name='sha256',
-        password=password.encode('utf-8'),
-        salt=SALT_PASSWORDS.encode('utf-8'),
-        iterations=131072
-    ).hex()
-    return password
+def password_hash(password: str, iterations: int = PASSWORDS_ITERATIONS):
+    return passwords_pool.hash(password=password, iterations=iterations)
 
 
 def token_create():
@@ -66,25 +58,30 @@ class Account(BaseModel):
     id = PrimaryKeyField()
     username = CharField(max_length=32, unique=True)
     password = CharField(max_length=64)
+    password_iterations = IntegerField(default=131072)
 
     def password_check(self, password):
-        if password_hash(password) == self.password:
-            return True
-        else:
+        if not compare_digest(password_hash(password, iterations=self.password_iterations), self.password):
             return False
+        # Hashes made with old parameters are upgraded transparently while the password is known
+        if self.password_iterations != PASSWORDS_ITERATIONS:
+            self.password = password_hash(password, iterations=PASSWORDS_ITERATIONS)
+            self.password_iterations = PASSWORDS_ITERATIONS
+            self.save()
+        return True
 
     def action_create(self, action: str, data=None):
 
         account_session = self.account_session if hasattr(self, 'account_session') else None
 
-        account_action = AccountAction(
+        action_add(
+            AccountAction,
             account=self,
             account_session=account_session,
             action=action,
             data=dumps(data if data else {}),
-            datetime=datetime.now(timezone.utc)
+            datetime=datetime.now(timezone.utc),
         )
-        account_action.save()
 
     class Meta:
         db_table = 'accounts'
@@ -93,9 +90,14 @@ class Account(BaseModel):
 class AccountSession(BaseModel):
     id = PrimaryKeyField()
     account = ForeignKeyField(Account, to_field='id')
-    token = CharField(max_length=256)
+    token = CharField(max_length=256, index=True)
     closed = BooleanField(default=False)
 
+    def close(self):
+        self.closed = True
+        self.save()
+        cache_sessions.delete(self.token)
+
     class Meta:
         db_table = 'accounts_sessions'
 
@@ -104,10 +106,13 @@ class AccountSessionDevice(BaseModel):
     id = PrimaryKeyField()
     account_session = ForeignKeyField(AccountSession, to_field='id')
     name = CharField(max_length=256)
-    ip_4 = CharField(max_length=15)
+    ip_4 = CharField(max_length=45)  # IPv6 addresses included
 
     class Meta:
         db_table = 'accounts_sessions_devices'
+        indexes = (
+            (('account_session', 'name', 'ip_4'), True),
+        )
 
 
 class AccountAction(BaseModel):
@@ -116,7 +121,7 @@ class AccountAction(BaseModel):
     account_session = ForeignKeyField(AccountSession, to_field='id', null=True, default=None)
     action = CharField(max_length=256)
     data = CharField(max_length=1024)
-    datetime = DateTimeField()
+    datetime = DateTimeField(index=True)
 
     class Meta:
         db_table = 'accounts_actions'
@@ -0,0 +1,296 @@
+#
+# (c) 2023, Yegor Yakubovich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+from datetime import datetime, timezone
+from gzip import compress
+from itertools import groupby, islice
+from json import dumps, loads
+from os import fsync, listdir, makedirs, path, replace, stat
+from threading import Lock
+from time import sleep
+from zlib import decompressobj
+
+from peewee import fn
+
+from app.database.account.models import AccountAction
+from app.database.pay.models import WalletAction, OfferAction, DealAction
+from app.functions.pagination import cursor_create, cursor_archive_create, limit_get
+from config import ARCHIVE_DIRECTORY, ARCHIVE_MONTHS_HOT, ARCHIVE_DELETE_DELAY, ARCHIVE_BLOCK_ROWS
+
+
+# Action tables only grow and are read almost only for recent history. Rows older than ARCHIVE_MONTHS_HOT
+# calendar months are moved out of the database into one partition per table and month:
+#   <ARCHIVE_DIRECTORY>/<table>/<YYYY-MM>.ndjson.gz  gzip members of up to ARCHIVE_BLOCK_ROWS NDJSON rows of one
+#                                                     owner, sorted by id
+#   <ARCHIVE_DIRECTORY>/<table>/<YYYY-MM>.index.json  owner id -> [[offset, length, count, id_min, id_max], ...]
+# so a page of one owner is read with a seek and the decompression of one block, whatever the size of its month.
+# The data file as a whole is a regular multi-member gzip file. Archived actions are listed month by month, then
+# the actions of the months still in the database
+actions_models = (
+    (AccountAction, AccountAction.account),
+    (WalletAction, WalletAction.wallet),
+    (OfferAction, OfferAction.offer),
+    (DealAction, DealAction.deal),
+)
+
+
+def month_start(value: datetime):
+    return datetime(value.year, value.month, 1, tzinfo=timezone.utc)
+
+
+def month_add(month: datetime, months: int):
+    month_number = month.year * 12 + month.month - 1 + months
+    return datetime(month_number // 12, month_number % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def partition_paths(table: str, month: datetime):
+    name = path.join(ARCHIVE_DIRECTORY, table, month.strftime('%Y-%m'))
+    return name + '.ndjson.gz', name + '.index.json'
+
+
+def partition_month(data_path: str):
+    return path.basename(data_path)[:7]
+
+
+def datetime_read(value):
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+class Archive:
+    def __init__(self):
+        self.lock = Lock()
+        self.partitions = {}
+
+    # Partitions of a table in month order, reloaded when the archival job adds one (the directory mtime changes)
+    def partitions_get(self, table: str):
+        directory = path.join(ARCHIVE_DIRECTORY, table)
+        try:
+            mtime = stat(directory).st_mtime_ns
+        except FileNotFoundError:
+            return []
+        with self.lock:
+            partitions = self.partitions.get(table)
+            if partitions and partitions[0] == mtime:
+                return partitions[1]
+            partitions = []
+            for name in sorted(listdir(directory)):
+                if not name.endswith('.index.json'):
+                    continue
+                with open(path.join(directory, name)) as file:
+                    index = loads(file.read())
+                partitions.append((path.join(directory, name[:-len('.index.json')] + '.ndjson.gz'), index))
+            self.partitions[table] = (mtime, partitions)
+            return partitions
+
+    # Blocks of one owner in listing order, from the partition of the month on
+    def blocks(self, table: str, owner_id: int, month: str = None):
+        for data_path, index in self.partitions_get(table=table):
+            if month and partition_month(data_path) < month:
+                continue
+            entries = index.get(str(owner_id))
+            if not entries:
+                continue
+            # Partitions written before the blocks were split hold a single block per owner
+            for entry in entries if isinstance(entries[0], list) else [entries]:
+                yield data_path, entry
+
+    # Rows of archived months stay in the table until the delete of the run, and an action can get a lower id than
+    # an action of the previous month when their requests straddle the month end, so the table is read by datetime
+    # from the month after the last partition
+    def hot_start(self, table: str):
+        partitions = self.partitions_get(table=table)
+        if not partitions:
+            return None
+        month = datetime.strptime(partition_month(partitions[-1][0]), '%Y-%m').replace(tzinfo=timezone.utc)
+        return month_add(month=month, months=1)
+
+    # Lines of one block, decompressed as they are read
+    def block_lines(self, data_path: str, entry: list):
+        offset, length = entry[0], entry[1]
+        decompressor = decompressobj(wbits=31)
+        rest = b''
+        with open(data_path, 'rb') as file:
+            file.seek(offset)
+            while length > 0:
+                data = file.read(min(length, 65536))
+                if not data:
+                    break
+                length -= len(data)
+                lines = (rest + decompressor.decompress(data)).split(b'\n')
+                rest = lines.pop()
+                for line in lines:
+                    yield line
+        lines = (rest + decompressor.flush()).split(b'\n')
+        for line in lines:
+            if line:
+                yield line
+
+    def block_read(self, model, data_path: str, entry: list):
+        rows = []
+        for line in self.block_lines(data_path=data_path, entry=entry):
+            row = model(**loads(line))
+            row.datetime = datetime_read(row.datetime)
+            rows.append(row)
+        return rows
+
+
+archive = Archive()
+
+
+# Same contract as paginate() over the owner's actions: the archived blocks come first, month by month in id order,
+# then the hot table by id. A cursor in the archive carries its month. Blocks are skipped with the counts and id
+# bounds of the index, a page decompresses one or two blocks
+def actions_paginate(model, owner_field, owner_id: int, page: int = None, after=None, limit: int = None):
+    limit = limit_get(limit=limit)
+    offset = limit * page - limit if page else 0
+    after = None if page else after
+    table = model._meta.table_name
+    rows = []
+    if not isinstance(after, int):
+        month_after, id_after = after or (None, 0)
+        for data_path, entry in archive.blocks(table=table, owner_id=owner_id, month=month_after):
+            month, count, id_max = partition_month(data_path), entry[2], entry[4]
+            if month == month_after and id_max <= id_after:
+                continue
+            if offset >= count:
+                offset -= count
+                continue
+            rows_block = archive.block_read(model=model, data_path=data_path, entry=entry)
+            if month == month_after:
+                rows_block = [row for row in rows_block if row.id > id_after]
+            rows.extend((month, row) for row in rows_block[offset:])
+            offset = 0
+            if len(rows) > limit:
+                break
+        after = None
+
+    if len(rows) <= limit:
+        query = model.select().where(owner_field == owner_id)
+        hot_start = archive.hot_start(table=table)
+        if hot_start:
+            query = query.where(model.datetime >= hot_start)
+        if after:
+            query = query.where(model.id > after)
+        rows.extend(
+            (None, row) for row in query.order_by(model.id).offset(offset or None).limit(limit + 1 - len(rows))
+        )
+
+    if len(rows) <= limit:
+        return [row for _, row in rows], None
+    rows = rows[:limit]
+    month, row = rows[-1]
+    cursor = cursor_create(row.id) if month is None else cursor_archive_create(month=month, id_=row.id)
+    return [row for _, row in rows], cursor
+
+
+# Every action of the owner in the order of actions_paginate(), archived blocks streamed line by line, then the hot
+# table in keyset chunks, so memory stays at one chunk whatever the length of the history
+def actions_iterate(model, owner_field, owner_id: int, since: datetime = None, chunk: int = 1000):
+    table = model._meta.table_name
+    for data_path, entry in archive.blocks(table=table, owner_id=owner_id):
+        month = datetime.strptime(partition_month(data_path), '%Y-%m').replace(tzinfo=timezone.utc)
+        if since and month_add(month=month, months=1) <= since:
+            continue
+        for line in archive.block_lines(data_path=data_path, entry=entry):
+            row = loads(line)
+            datetime_ = datetime_read(row['datetime'])
+            if not since or datetime_ >= since:
+                yield row['id'], row['action'], row['data'], datetime_
+
+    query = model.select(model.id, model.action, model.data, model.datetime).where(owner_field == owner_id)
+    hot_start = archive.hot_start(table=table)
+    if since or hot_start:
+        query = query.where(model.datetime >= max(value for value in (since, hot_start) if value))
+    id_last = 0
+    while True:
+        rows = list(query.where(model.id > id_last).order_by(model.id).limit(chunk).tuples())
+        for id_, action, data, datetime_ in rows:
+            yield id_, action, data, datetime_read(datetime_)
+        if len(rows) < chunk:
+            return
+        id_last = rows[-1][0]
+
+
+def partition_write(model, owner_field, month: datetime):
+    data_path, index_path = partition_paths(table=model._meta.table_name, month=month)
+    makedirs(path.dirname(data_path), exist_ok=True)
+    rows = (model
+            .select()
+            .where((model.datetime >= month) & (model.datetime < month_add(month=month, months=1)))
+            .order_by(owner_field, model.id)
+            .dicts()
+            .iterator())
+    index = {}
+    offset = 0
+    with open(data_path + '.tmp', 'wb') as file:
+        for owner_id, rows_owner in groupby(rows, key=lambda row: row[owner_field.name]):
+            entries = index[str(owner_id)] = []
+            for rows_block in iter(lambda: list(islice(rows_owner, ARCHIVE_BLOCK_ROWS)), []):
+                block = compress(''.join(dumps(row, default=str) + '\n' for row in rows_block).encode())
+                file.write(block)
+                entries.append([offset, len(block), len(rows_block), rows_block[0]['id'], rows_block[-1]['id']])
+                offset += len(block)
+        file.flush()
+        fsync(file.fileno())
+    with open(index_path + '.tmp', 'w') as file:
+        file.write(dumps(index))
+        file.flush()
+        fsync(file.fileno())
+    # The index appears last, a partition without it is not read
+    replace(data_path + '.tmp', data_path)
+    replace(index_path + '.tmp', index_path)
+    return sum(entry[2] for entries in index.values() for entry in entries)
+
+
+def partition_delete(model, month: datetime, batch: int = 10000):
+    where = (model.datetime >= month) & (model.datetime < month_add(month=month, months=1))
+    deleted = 0
+    while True:
+        ids = [row[0] for row in model.select(model.id).where(where).limit(batch).tuples()]
+        if not ids:
+            return deleted
+        deleted += model.delete().where(model.id.in_(ids)).execute()
+
+
+# Rows never get an older datetime than the time of their insert, so once a partition file exists the rows of its
+# month still in the table are copies and only need deleting: an interrupted run is finished by the next one.
+# Rows are deleted after ARCHIVE_DELETE_DELAY seconds, when no request that listed the partitions before the new
+# ones appeared is still reading the hot table
+def actions_archive(months_hot: int = ARCHIVE_MONTHS_HOT, delete_delay: int = ARCHIVE_DELETE_DELAY):
+    cutoff = month_add(month=month_start(datetime.now(timezone.utc)), months=1 - months_hot)
+    archived = []
+    for model, owner_field in actions_models:
+        database = model._meta.database
+        with database.connection_context():
+            datetime_min = model.select(fn.MIN(model.datetime)).scalar()
+            if not datetime_min:
+                continue
+            month = month_start(datetime_read(datetime_min))
+            while month < cutoff:
+                data_path, index_path = partition_paths(table=model._meta.table_name, month=month)
+                rows = None if path.exists(index_path) else partition_write(model, owner_field, month)
+                archived.append((model, month, rows))
+                month = month_add(month=month, months=1)
+
+    if archived:
+        sleep(delete_delay)
+    for model, month, rows in archived:
+        with model._meta.database.connection_context():
+            deleted = partition_delete(model=model, month=month)
+        yield model._meta.table_name, month.strftime('%Y-%m'), rows, deleted
@@ -0,0 +1,92 @@
+#
+# (c) 2023, Yegor Yakubovich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+from peewee import SqliteDatabase
+
+from app.database.account import AccountSession
+from app.database.pay import Wallet, WalletAction, Offer
+
+
+# Hot queries and the indexes they must use, checked with EXPLAIN after schema or query changes
+queries_hot = (
+    (
+        'account_session_by_token',
+        lambda: AccountSession.select().where(AccountSession.token == ''),
+        ('accountsession_token',),
+    ),
+    (
+        'wallet_by_account',
+        lambda: Wallet.select().where(Wallet.account_id == 0),
+        ('wallet_account_id',),
+    ),
+    (
+        'offers_by_wallet',
+        lambda: Offer.select().where(
+            (Offer.wallet == 0) &
+            (Offer.deleted == False) &
+            (Offer.id > 0)
+        ).order_by(Offer.id).limit(11),
+        ('offer_wallet_id_deleted',),
+    ),
+    (
+        'wallet_actions_history',
+        lambda: WalletAction.select().where(
+            (WalletAction.wallet == 0) &
+            (WalletAction.id > 0)
+        ).order_by(WalletAction.id).limit(11),
+        ('walletaction_wallet_id_id',),
+    ),
+    (
+        'offers_search',
+        lambda: Offer.select().where(
+            (Offer.system == 0) &
+            (Offer.type == '') &
+            (Offer.active == True) &
+            (Offer.deleted == False) &
+            (Offer.value_from <= 0) &
+            (Offer.value_to >= 0) &
+            ((Offer.rate > 0) | ((Offer.rate == 0) & (Offer.id > 0)))
+        ).order_by(Offer.rate, Offer.id).limit(11),
+        ('offer_system_id_type_active_deleted_rate_id',),
+    ),
+)
+
+
+def query_indexes_used(query):
+    # Models are bound to database proxies
+    database = query.model._meta.database.obj
+    sql, params = query.sql()
+    if isinstance(database, SqliteDatabase):
+        cursor = database.execute_sql('EXPLAIN QUERY PLAN ' + sql, params)
+        indexes = []
+        for row in cursor.fetchall():
+            detail = row[-1]
+            if ' INDEX ' in detail:
+                indexes.append(detail.split(' INDEX ')[1].split(' ')[0])
+        return indexes
+    cursor = database.execute_sql('EXPLAIN ' + sql, params)
+    columns = [column[0] for column in cursor.description]
+    return [row['key'] for row in (dict(zip(columns, row)) for row in cursor.fetchall()) if row['key']]
+
+
+def queries_hot_check():
+    failures = []
+    for name, query_create, indexes_expected in queries_hot:
+        indexes = query_indexes_used(query_create())
+        if not any(index in indexes for index in indexes_expected):
+            failures.append((name, indexes_expected, indexes))
+    return failures
@@ -0,0 +1,93 @@
+#
+# (c) 2023, Yegor Yakubovich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+from collections import Counter
+from json import dumps
+from logging import getLogger, StreamHandler, INFO, WARNING
+from time import perf_counter
+
+from flask import g, has_request_context, request
+
+from config import QUERIES_LOG, QUERIES_REPEATED_MAX, QUERIES_SLOW_MS
+
+
+# One line per request with QUERIES_LOG, otherwise only likely N+1 and requests slower than QUERIES_SLOW_MS
+logger = getLogger('app.queries')
+logger.setLevel(INFO if QUERIES_LOG else WARNING)
+logger.addHandler(StreamHandler())
+logger.propagate = False
+
+
+class QueriesStats:
+    def __init__(self):
+        self.time_start = perf_counter()
+        self.count = 0
+        self.time = 0.0
+        self.shapes = Counter()
+
+
+# Mixed into the database classes, every query is counted and timed for the current request. Queries are
+# parametrized, so the SQL text is the query shape: a shape repeated within a request is a likely N+1
+class QueriesInstrumented:
+    def execute_sql(self, sql, params=None):
+        time_start = perf_counter()
+        try:
+            return super().execute_sql(sql, params)
+        finally:
+            if has_request_context() and 'queries' in g:
+                g.queries.count += 1
+                g.queries.time += perf_counter() - time_start
+                g.queries.shapes[sql] += 1
+
+
+def queries_start():
+    g.queries = QueriesStats()
+
+
+def queries_finish(response):
+    queries = g.pop('queries', None)
+    if not queries:
+        return response
+    time_total = perf_counter() - queries.time_start
+    # A streamed response (the actions export) runs most of its queries after this point, the figures would only
+    # cover the request up to the first chunk, so it gets no header and its line says so
+    if not response.is_streamed:
+        response.headers['Server-Timing'] = 'db;dur={db:.2f};desc="{count} queries", app;dur={app:.2f}'.format(
+            db=queries.time * 1000,
+            count=queries.count,
+            app=(time_total - queries.time) * 1000,
+        )
+    repeated = [
+        {'sql': sql, 'count': count} for sql, count in queries.shapes.items() if count > QUERIES_REPEATED_MAX
+    ]
+    logger.log(WARNING if time_total * 1000 > QUERIES_SLOW_MS else INFO, dumps({
+        'endpoint': request.endpoint,
+        'path': request.path,
+        'status': response.status_code,
+        'streamed': response.is_streamed,
+        'queries': queries.count,
+        'db_ms': round(queries.time * 1000, 3),
+        'total_ms': round(time_total * 1000, 3),
+        'n_plus_one': repeated,
+    }))
+    if repeated:
+        logger.warning(dumps({
+            'endpoint': request.endpoint,
+            'warning': 'repeated query shapes, likely N+1',
+            'n_plus_one': repeated,
+        }))
+    return response
@@ -0,0 +1,159 @@
+#
+# (c) 2023, Yegor Yakubovich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+from datetime import datetime, timezone
+
+from peewee import Model, IntegerField, CharField, DateTimeField, ModelIndex, SqliteDatabase, fn
+from playhouse.migrate import SchemaMigrator, migrate
+
+from app.database import databases
+from app.database.account.models import Account, AccountSession, AccountSessionDevice, AccountAction, \
+    database_account
+from app.database.pay.models import Wallet, WalletAction, WalletCheckpoint, Offer, OfferAction, DealAction, \
+    database_pay
+
+
+class Migration(Model):
+    version = IntegerField(primary_key=True)
+    name = CharField(max_length=64)
+    datetime = DateTimeField()
+
+    class Meta:
+        db_table = 'migrations'
+
+
+def indexes_create(*indexes):
+    # Every index is (model, fields, unique). An index is skipped if the table already has one over the same columns,
+    # whatever its name, so the migration is idempotent and does not duplicate indexes MySQL created for foreign keys
+    def function(database):
+        for model, fields, unique in indexes:
+            indexes_columns = [index.columns for index in database.get_indexes(model._meta.table_name)]
+            fields = [model._meta.fields[field] for field in fields]
+            if [field.column_name for field in fields] in indexes_columns:
+                continue
+            database.execute(model._schema._create_index(ModelIndex(model, fields, unique=unique), safe=False))
+    return function
+
+
+def columns_add(*fields):
+    # Columns missing in existing tables are added with their defaults
+    def function(database):
+        migrator = SchemaMigrator.from_database(database)
+        for field in fields:
+            table_name = field.model._meta.table_name
+            if field.column_name in {column.name for column in database.get_columns(table_name)}:
+                continue
+            migrate(migrator.add_column(table_name, field.column_name, field))
+    return function
+
+
+def columns_alter(*fields):
+    # Columns of existing tables are changed to the type the fields declare. SQLite does not enforce the length of
+    # VARCHAR columns, its tables are left as they are. Databases are proxies
+    def function(database):
+        if isinstance(database.obj, SqliteDatabase):
+            return
+        migrator = SchemaMigrator.from_database(database)
+        for field in fields:
+            migrate(migrator.alter_column_type(field.model._meta.table_name, field.column_name, field))
+    return function
+
+
+def tables_add(*models_add):
+    def function(database):
+        database.create_tables(models_add, safe=True)
+    return function
+
+
+def devices_unique(database):
+    # A device is written once per session, user agent and ip: repeated rows are deleted keeping the first one and
+    # the index over name and ip_4 is replaced by a unique index
+    fields = (AccountSessionDevice.account_session, AccountSessionDevice.name, AccountSessionDevice.ip_4)
+    duplicates = (
+        AccountSessionDevice
+        .select(*fields, fn.MIN(AccountSessionDevice.id))
+        .group_by(*fields)
+        .having(fn.COUNT(AccountSessionDevice.id) > 1)
+        .tuples()
+    )
+    for account_session_id, name, ip_4, device_id in list(duplicates):
+        AccountSessionDevice.delete().where(
+            (AccountSessionDevice.account_session == account_session_id) &
+            (AccountSessionDevice.name == name) &
+            (AccountSessionDevice.ip_4 == ip_4) &
+            (AccountSessionDevice.id != device_id)
+        ).execute()
+    migrator = SchemaMigrator.from_database(database)
+    table_name = AccountSessionDevice._meta.table_name
+    for index in database.get_indexes(table_name):
+        if index.columns == ['name', 'ip_4']:
+            migrate(migrator.drop_index(table_name, index.name))
+    indexes_create(
+        (AccountSessionDevice, ('account_session', 'name', 'ip_4'), True),
+    )(database)
+
+
+# Versions are counted per database. A migration lists what it changes, so it does the same whatever the models
+# declare by the time it runs; tables missing altogether are created as currently declared before the migrations
+migrations = (
+    (1, 'indexes_hot_lookups', database_account, indexes_create(
+        (AccountSession, ('token',), False),
+        (AccountSessionDevice, ('name', 'ip_4'), False),
+    )),
+    (1, 'indexes_hot_lookups', database_pay, indexes_create(
+        (Wallet, ('account_id',), False),
+        (Offer, ('wallet', 'deleted'), False),
+        (WalletAction, ('wallet', 'id'), False),
+    )),
+    (2, 'accounts_password_iterations', database_account, columns_add(
+        Account.password_iterations,
+    )),
+    (3, 'indexes_offers_search', database_pay, indexes_create(
+        (Offer, ('system', 'type', 'active', 'deleted', 'rate', 'id'), False),
+    )),
+    (4, 'wallets_checkpoints', database_pay, tables_add(
+        WalletCheckpoint,
+    )),
+    (5, 'indexes_actions_datetime', database_account, indexes_create(
+        (AccountAction, ('datetime',), False),
+    )),
+    (5, 'indexes_actions_datetime', database_pay, indexes_create(
+        (WalletAction, ('datetime',), False),
+        (OfferAction, ('datetime',), False),
+        (DealAction, ('datetime',), False),
+    )),
+    (6, 'devices_unique', database_account, devices_unique),
+    (7, 'devices_ip_6', database_account, columns_alter(
+        AccountSessionDevice.ip_4,
+    )),
+)
+
+
+def migrations_run():
+    applied = []
+    for database in databases:
+        with database.connection_context(), Migration.bind_ctx(database):
+            Migration.create_table()
+            versions = {migration.version for migration in Migration.select()}
+            for version, name, migration_database, function in migrations:
+                if migration_database is not database or version in versions:
+                    continue
+                with database.atomic():
+                    function(database)
+                    Migration.create(version=version, name=name, datetime=datetime.now(timezone.utc))
+                applied.append((database.database, version, name))
+    return applied
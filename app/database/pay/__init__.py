@@ -15,7 +15,8 @@
 #
 
 
-from app.database.pay.models import Currency, System, Wallet, WalletAction, Offer, OfferAction, Deal, DealAction
+from app.database.pay.models import Currency, System, Wallet, WalletAction, WalletCheckpoint, Offer, OfferAction, \
+    Deal, DealAction
 
 
 models_pay = [
@@ -23,6 +24,7 @@ models_pay = [
     System,
     Wallet,
     WalletAction,
+    WalletCheckpoint,
     Offer,
     OfferAction,
     Deal,
@@ -15,24 +15,19 @@
 #
 
 
+from collections import namedtuple
 from datetime import datetime, timezone
 from json import dumps
 
-from peewee import MySQLDatabase, Model, PrimaryKeyField, CharField, DateTimeField, ForeignKeyField, BooleanField, \
+from peewee import DatabaseProxy, Model, PrimaryKeyField, CharField, DateTimeField, ForeignKeyField, BooleanField, \
     BigIntegerField, IntegerField
 
-from config import DB_USER, DB_PASSWORD, DB_HOST, DB_PORT
+from app.database.pool import database_create
+from app.database.transaction import action_add
 
 
-database_pay = MySQLDatabase(
-    database='adecty_pay',
-    user=DB_USER,
-    password=DB_PASSWORD,
-    host=DB_HOST,
-    port=DB_PORT,
-    charset='utf8mb4',
-    autoconnect=False,
-)
+database_pay = DatabaseProxy()
+database_pay.initialize(database_create(name='adecty_pay'))
 
 
 class WalletActions:
@@ -47,11 +42,18 @@ class OfferActions:
     delete = 'delete'
 
 
+class DealActions:
+    create = 'create'
+
+
 class OfferType:
     input = 'input'
     output = 'output'
 
 
+WalletBalance = namedtuple('WalletBalance', ('applied', 'balance', 'balance_frozen'))
+
+
 class BaseModel(Model):
     class Meta:
         database = database_pay
@@ -81,20 +83,56 @@ class System(BaseModel):
 
 class Wallet(BaseModel):
     id = PrimaryKeyField()
-    account_id = BigIntegerField(null=True)
+    account_id = BigIntegerField(null=True, index=True)
     company_id = BigIntegerField(null=True)
-    balance = BigIntegerField()
-    balance_frozen = BigIntegerField()
+    balance = BigIntegerField(default=0)
+    balance_frozen = BigIntegerField(default=0)
 
     def action_create(self, action: str, data=None):
-        wallet_action = WalletAction(
+        action_add(
+            WalletAction,
             wallet=self,
             account_session_id=self.account_session.id,
             action=action,
             data=dumps(data if data else {}),
-            datetime=datetime.now(timezone.utc)
+            datetime=datetime.now(timezone.utc),
         )
-        wallet_action.save()
+
+    # Balances are changed with one conditional UPDATE instead of read-modify-write, so concurrent requests
+    # on the same wallet can not overdraw it. The instance is refreshed with the values after the update
+    def balance_update(self, balance: int = 0, balance_frozen: int = 0):
+        query = Wallet.update(
+            balance=Wallet.balance + balance,
+            balance_frozen=Wallet.balance_frozen + balance_frozen,
+        ).where(
+            (Wallet.id == self.id) &
+            (Wallet.balance + balance >= 0) &
+            (Wallet.balance_frozen + balance_frozen >= 0)
+        )
+        if self._meta.database.returning_clause:
+            rows = list(query.returning(Wallet.balance, Wallet.balance_frozen).tuples())
+            applied = bool(rows)
+            if applied:
+                self.balance, self.balance_frozen = rows[0]
+        else:
+            applied = query.execute() == 1
+        if not applied or not self._meta.database.returning_clause:
+            self.balance, self.balance_frozen = Wallet.select(
+                Wallet.balance, Wallet.balance_frozen,
+            ).where(Wallet.id == self.id).tuples().get()
+        return WalletBalance(applied=applied, balance=self.balance, balance_frozen=self.balance_frozen)
+
+    def balance_freeze(self, value: int):
+        return self.balance_update(balance=-value, balance_frozen=value)
+
+    def balance_unfreeze(self, value: int):
+        return self.balance_update(balance=value, balance_frozen=-value)
+
+    def balance_credit(self, value: int):
+        return self.balance_update(balance=value)
+
+    def balance_debit(self, value: int):
+        return self.balance_update(balance=-value)
 
     class Meta:
         db_table = 'wallets'
@@ -106,10 +144,25 @@ class WalletAction(BaseModel):
     account_session_id = BigIntegerField()
     action = CharField(max_length=256)
     data = CharField(max_length=1024)
-    datetime = DateTimeField()
+    datetime = DateTimeField(index=True)
 
     class Meta:
         db_table = 'wallets_actions'
+        indexes = (
+            (('wallet', 'id'), False),
+        )
+
+
+# Last verified state of a wallet: the balances after its action action_id, see app/functions/reconciliation.py
+class WalletCheckpoint(BaseModel):
+    wallet = ForeignKeyField(Wallet, to_field='id', primary_key=True)
+    action_id = BigIntegerField()
+    balance = BigIntegerField()
+    balance_frozen = BigIntegerField()
+    datetime = DateTimeField()
+
+    class Meta:
+        db_table = 'wallets_checkpoints'
 
 
 class Offer(BaseModel):
@@ -126,17 +179,37 @@ class Offer(BaseModel):
     deleted = BooleanField(default=False)
 
     def action_create(self, action: str, data=None):
-        offer_action = OfferAction(
+        action_add(
+            OfferAction,
             offer=self,
             account_session_id=self.account_session.id,
             action=action,
             data=dumps(data if data else {}),
-            datetime=datetime.now(timezone.utc)
+            datetime=datetime.now(timezone.utc),
         )
-        offer_action.save()
+
+    # Funds of a deal are taken from the frozen value_to with one conditional UPDATE, like Wallet.balance_update.
+    # It applies only at the quoted rate and while the offer still covers the value, a concurrent deal that
+    # took the funds first makes it fail, and the caller moves on to the next offer instead of waiting for a lock
+    def value_reserve(self, value: int, rate: int):
+        return Offer.update(
+            value_to=Offer.value_to - value,
+        ).where(
+            (Offer.id == self.id) &
+            (Offer.rate == rate) &
+            (Offer.active == True) &
+            (Offer.deleted == False) &
+            (Offer.value_from <= value) &
+            (Offer.value_to >= value)
+        ).execute() == 1
 
     class Meta:
         db_table = 'offers'
+        indexes = (
+            (('wallet', 'deleted'), False),
+            # Public search: equality on the system and type, then the rate order straight from the index
+            (('system', 'type', 'active', 'deleted', 'rate', 'id'), False),
+        )
 
 
 class OfferAction(BaseModel):
@@ -145,7 +218,7 @@ class OfferAction(BaseModel):
     account_session_id = BigIntegerField()
     action = CharField(max_length=256)
     data = CharField(max_length=1024)
-    datetime = DateTimeField()
+    datetime = DateTimeField(index=True)
 
     class Meta:
         db_table = 'offers_actions'
@@ -158,6 +231,16 @@ class Deal(BaseModel):
     value = BigIntegerField()
     rate = BigIntegerField()
 
+    def action_create(self, action: str, data=None):
+        action_add(
+            DealAction,
+            deal=self,
+            account_session_id=self.account_session.id,
+            action=action,
+            data=dumps(data if data else {}),
+            datetime=datetime.now(timezone.utc),
+        )
+
     class Meta:
         db_table = 'deals_inputs'
 
@@ -168,7 +251,7 @@ class DealAction(BaseModel):
     account_session_id = BigIntegerField()
     action = CharField(max_length=256)
     data = CharField(max_length=1024)
-    datetime = DateTimeField()
+    datetime = DateTimeField(index=True)
 
     class Meta:
         db_table = 'deals_actions'
@@ -0,0 +1,76 @@
+#
+# (c) 2023, Yegor Yakubovich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+from threading import Lock
+from time import perf_counter
+
+from playhouse.pool import PooledMySQLDatabase
+
+from app.database.instrumentation import QueriesInstrumented
+from config import DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, DB_POOL_MAX_CONNECTIONS, DB_POOL_STALE_TIMEOUT, \
+    DB_POOL_TIMEOUT
+
+
+# Connections are checked out lazily on the first query of a request (autoconnect)
+# and returned to the pool in teardown_request. Models use it through a DatabaseProxy,
+# so a local stand-in can be swapped in (see benchmarks/database.py)
+class MySQLDatabasePooled(QueriesInstrumented, PooledMySQLDatabase):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = Lock()
+        self.checkouts = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def connect(self, reuse_if_open=False):
+        time_start = perf_counter()
+        result = super().connect(reuse_if_open=reuse_if_open)
+        wait_time = perf_counter() - time_start
+        with self._stats_lock:
+            self.checkouts += 1
+            self.wait_time_total += wait_time
+            self.wait_time_max = max(self.wait_time_max, wait_time)
+        return result
+
+    def stats(self):
+        in_use = len(self._in_use)
+        return {
+            'database': self.database,
+            'max_connections': self._max_connections,
+            'in_use': in_use,
+            'idle': len(self._connections),
+            'utilisation': in_use / self._max_connections if self._max_connections else 0.0,
+            'checkouts': self.checkouts,
+            'wait_time_total': self.wait_time_total,
+            'wait_time_max': self.wait_time_max,
+            'wait_time_average': self.wait_time_total / self.checkouts if self.checkouts else 0.0,
+        }
+
+
+def database_create(name: str):
+    return MySQLDatabasePooled(
+        database=name,
+        user=DB_USER,
+        password=DB_PASSWORD,
+        host=DB_HOST,
+        port=DB_PORT,
+        charset='utf8mb4',
+        max_connections=DB_POOL_MAX_CONNECTIONS,
+        stale_timeout=DB_POOL_STALE_TIMEOUT,
+        timeout=DB_POOL_TIMEOUT,
+    )
@@ -0,0 +1,70 @@
+#
+# (c) 2023, Yegor Yakubovich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+from contextlib import ExitStack
+
+from flask import g, has_app_context
+
+
+# Actions (audit rows) created inside a transaction are buffered per request and written with one
+# INSERT per table right before the commit, so the audit trail is atomic with the change it records.
+# Callbacks registered with on_commit() run only once all the databases have committed
+def transaction(*databases):
+    def wrapper(function):
+        def executor(*args, **kwargs):
+            with ExitStack() as stack:
+                for database in databases:
+                    stack.enter_context(database.atomic())
+                g.actions = []
+                g.commit_callbacks = []
+                try:
+                    response = function(*args, **kwargs)
+                    actions_flush()
+                    commit_callbacks = g.commit_callbacks
+                finally:
+                    g.actions = None
+                    g.commit_callbacks = None
+            for callback in commit_callbacks:
+                callback()
+            return response
+
+        return executor
+
+    return wrapper
+
+
+def on_commit(callback):
+    if has_app_context() and g.get('commit_callbacks') is not None:
+        g.commit_callbacks.append(callback)
+        return
+    callback()
+
+
+def action_add(model, **fields):
+    if has_app_context() and g.get('actions') is not None:
+        g.actions.append((model, fields))
+        return
+    model.insert(**fields).execute()
+
+
+def actions_flush():
+    actions_models = {}
+    for model, fields in g.actions:
+        actions_models.setdefault(model, []).append(fields)
+    g.actions = []
+    for model, rows in actions_models.items():
+        model.insert_many(rows).execute()
@@ -0,0 +1,114 @@
+#
+# (c) 2023, Yegor Yakubovich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+from collections import OrderedDict
+from json import dumps, loads
+from threading import Lock
+from time import monotonic
+
+from config import CACHE_SESSIONS_TTL, CACHE_SESSIONS_ITEMS, CACHE_OFFERS_SEARCH_TTL, CACHE_OFFERS_SEARCH_ITEMS, \
+    ORDER_BOOK_CHANGES
+
+try:
+    # Available only when running under uWSGI, caches declared in wsgi.ini are shared by all workers
+    import uwsgi
+except ImportError:
+    uwsgi = None
+
+
+class CacheLocal:
+    # In-process stand-in for the uWSGI shared cache: LRU eviction with TTL, ttl=0 never expires
+    def __init__(self, ttl: int, items: int):
+        self.ttl = ttl
+        self.items = items
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            item = self._data.get(key)
+            if not item:
+                return None
+            expires, value = item
+            if expires and expires < monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: dict):
+        with self._lock:
+            self._data[key] = (monotonic() + self.ttl if self.ttl else None, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.items:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class CacheUwsgi:
+    # Shared memory cache of uWSGI, TTL and LRU eviction are configured with cache2 in wsgi.ini
+    def __init__(self, name: str, ttl: int):
+        self.name = name
+        self.ttl = ttl
+
+    def get(self, key: str):
+        value = uwsgi.cache_get(key, self.name)
+        return loads(value) if value else None
+
+    def set(self, key: str, value: dict):
+        uwsgi.cache_update(key, dumps(value), self.ttl, self.name)
+
+    def delete(self, key: str):
+        uwsgi.cache_del(key, self.name)
+
+    def clear(self):
+        uwsgi.cache_clear(self.name)
+
+
+class CacheLock:
+    # Read-modify-write of shared cache items: the uWSGI lock serializes all the workers, the stand-in the threads
+    def __init__(self):
+        self._lock = Lock()
+
+    def __enter__(self):
+        uwsgi.lock() if uwsgi else self._lock.acquire()
+
+    def __exit__(self, *args):
+        uwsgi.unlock() if uwsgi else self._lock.release()
+
+
+def cache_create(name: str, ttl: int, items: int):
+    if uwsgi:
+        caches = uwsgi.opt.get('cache2', [])
+        caches = caches if isinstance(caches, list) else [caches]
+        if any(cache.decode().startswith('name={name},'.format(name=name)) for cache in caches):
+            return CacheUwsgi(name=name, ttl=ttl)
+    return CacheLocal(ttl=ttl, items=items)
+
+
+cache_sessions = cache_create(name='sessions', ttl=CACHE_SESSIONS_TTL, items=CACHE_SESSIONS_ITEMS)
+cache_versions = cache_create(name='versions', ttl=0, items=16)
+cache_order_book = cache_create(name='order_book', ttl=0, items=ORDER_BOOK_CHANGES)
+cache_offers_search = cache_create(name='offers_search', ttl=CACHE_OFFERS_SEARCH_TTL, items=CACHE_OFFERS_SEARCH_ITEMS)
+cache_lock = CacheLock()
@@ -13,191 +13,365 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+from datetime import datetime, timezone
 from json import loads
+from re import compile as re_compile, escape as re_escape
 
 from flask import request
 
-from app.database.account import AccountSession, AccountSessionDevice
-from app.database.pay import Wallet, System, Currency
+from app.database.account import Account, AccountSession
+from app.database.pay import Wallet
+from app.functions.cache import cache_sessions
 from app.functions.data_output import data_output, ResponseStatus
+from app.functions.devices import device_record
+from app.functions.pagination import cursor_read, cursor_rate_read, cursor_archive_read
+from app.functions.references import currencies_get, currency_get, systems_get
 
 
-def device_get(account_session=None):
-    name = request.headers.get('User-Agent')
-    ip_4 = request.remote_addr
-    account_session_device = AccountSessionDevice.get_or_none(
-        (AccountSessionDevice.name == name) &
-        (AccountSessionDevice.ip_4 == ip_4)
-    )
-    if not account_session:
-        return name, ip_4
-    if not account_session_device:
-        account_session_device = AccountSessionDevice(
-            account_session=account_session,
-            name=name,
-            ip_4=ip_4,
+def device_get():
+    return (request.headers.get('User-Agent') or '')[:256], (request.remote_addr or '')[:45]
+
+
+def device_track(account_session: AccountSession):
+    name, ip_4 = device_get()
+    device_record(account_session_id=account_session.id, name=name, ip_4=ip_4)
+
+
+def account_session_get(token: str):
+    cached = cache_sessions.get(token)
+    if cached:
+        account_session = AccountSession(
+            id=cached['account_session_id'],
+            account=cached['account_id'],
+            token=token,
+            closed=cached['closed'],
         )
-        account_session_device.save()
+        account_session.wallet_id = cached['wallet_id']
+        return account_session
+
+    account_session = AccountSession.get_or_none(AccountSession.token == token)
+    if not account_session:
+        return None
+    account_session.wallet_id = None
+    account_session_cache(account_session=account_session)
     return account_session
 
 
+def account_session_cache(account_session: AccountSession):
+    cache_sessions.set(account_session.token, {
+        'account_session_id': account_session.id,
+        'account_id': account_session.account_id,
+        'closed': account_session.closed,
+        'wallet_id': account_session.wallet_id,
+    })
+
+
+def wallet_get(account_session: AccountSession):
+    if account_session.wallet_id:
+        return Wallet.get_or_none(Wallet.id == account_session.wallet_id)
+    wallet = Wallet.get_or_none(Wallet.account_id == account_session.account_id)
+    if wallet:
+        account_session.wallet_id = wallet.id
+        account_session_cache(account_session=account_session)
+    return wallet
+
+
+def error_type(key: str, key_type: str):
+    return data_output(
+        status=ResponseStatus.error,
+        message='Key {key} must match the type {key_type}'.format(
+            key=key,
+            key_type=key_type,
+        ),
+    )
+
+
+# Schemas are compiled once, when data_input is applied, into a list of steps per key.
+# Every step takes the value and the collected data and returns the (possibly converted) value and an error response
+def step_account_session_token(requirements: dict):
+    account_required = requirements.get('account') == True
+    wallet_required = requirements.get('wallet') == True
+
+    def step(value, data: dict):
+        account_session = account_session_get(token=value)
+        if not account_session:
+            return value, data_output(
+                status=ResponseStatus.error,
+                message='Token does not exist',
+            )
+        if account_session.closed:
+            return value, data_output(
+                status=ResponseStatus.error,
+                message='Token expired',
+            )
+
+        device_track(account_session=account_session)
+
+        account = Account(id=account_session.account_id)
+        account.account_session = account_session
+
+        if account_required:
+            data['account'] = account
+        if wallet_required:
+            wallet = wallet_get(account_session=account_session)
+            if not wallet:
+                return value, data_output(
+                    status=ResponseStatus.error,
+                    message='Wallet not created for this account',
+                )
+            wallet.account_session = account_session
+            data['wallet'] = wallet
+        return value, None
+    return step
+
+
+def step_currency(key: str):
+    def step(value, data: dict):
+        currency = currency_get(name=value)
+        if not currency:
+            return value, data_output(
+                status=ResponseStatus.error,
+                message='{key} must be from the list {currencies}'.format(
+                    key=key,
+                    currencies=[currency.name for currency in currencies_get()],
+                ),
+            )
+        return currency, None
+    return step
+
+
+def step_type_string(key: str):
+    def step(value, data: dict):
+        if type(value) != str:
+            return value, error_type(key=key, key_type='string')
+        return value, None
+    return step
+
+
+def step_type_integer(key: str):
+    def step(value, data: dict):
+        if not str(value).isdigit():
+            return value, error_type(key=key, key_type='integer')
+        return int(value), None
+    return step
+
+
+def step_type_dictionary(key: str):
+    def step(value, data: dict):
+        try:
+            return loads(value), None
+        except TypeError:
+            return value, error_type(key=key, key_type='dictionary')
+    return step
+
+
+def step_type_boolean(key: str):
+    def step(value, data: dict):
+        if type(value) != bool:
+            return value, error_type(key=key, key_type='boolean')
+        return value, None
+    return step
+
+
+def step_type_datetime(key: str):
+    def step(value, data: dict):
+        try:
+            value = datetime.fromisoformat(value)
+        except (TypeError, ValueError):
+            return value, error_type(key=key, key_type='datetime')
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc), None
+    return step
+
+
+def step_type_list(key: str):
+    def step(value, data: dict):
+        if type(value) != list:
+            return value, error_type(key=key, key_type='list')
+        return value, None
+    return step
+
+
+def step_type_cursor(key: str):
+    def step(value, data: dict):
+        value = cursor_read(value)
+        if value is None:
+            return value, error_type(key=key, key_type='cursor')
+        return value, None
+    return step
+
+
+def step_type_cursor_rate(key: str):
+    def step(value, data: dict):
+        value = cursor_rate_read(value)
+        if value is None:
+            return value, error_type(key=key, key_type='cursor')
+        return value, None
+    return step
+
+
+# Actions lists continue either in the hot table (an id) or in the archive (a month and an id)
+def step_type_cursor_actions(key: str):
+    def step(value, data: dict):
+        cursor = cursor_read(value)
+        value = cursor_archive_read(value) if cursor is None else cursor
+        if value is None:
+            return value, error_type(key=key, key_type='cursor')
+        return value, None
+    return step
+
+
+steps_type = {
+    'string': step_type_string,
+    'integer': step_type_integer,
+    'dictionary': step_type_dictionary,
+    'boolean': step_type_boolean,
+    'list': step_type_list,
+    'cursor': step_type_cursor,
+    'datetime': step_type_datetime,
+    'cursor_rate': step_type_cursor_rate,
+    'cursor_actions': step_type_cursor_actions,
+}
+
+
+def step_length_min(key: str, length_min: int):
+    def step(value, data: dict):
+        if len(value) < length_min:
+            return value, data_output(
+                status=ResponseStatus.error,
+                message='Key length {key} be at least {requirement_value} characters. '
+                        'Your length: {length}'.format(
+                    key=key,
+                    requirement_value=length_min,
+                    length=len(value),
+                ),
+            )
+        return value, None
+    return step
+
+
+def step_length_max(key: str, length_max: int):
+    def step(value, data: dict):
+        if len(value) > length_max:
+            return value, data_output(
+                status=ResponseStatus.error,
+                message='Key length {key} must be no more than '
+                        '{requirement_value} characters. Your length: {length}'.format(
+                    key=key,
+                    requirement_value=length_max,
+                    length=len(value),
+                ),
+            )
+        return value, None
+    return step
+
+
+def step_characters_allowed(key: str, characters_allowed: str):
+    # Finds the first forbidden character in one pass instead of scanning the allowed string for every character
+    characters_forbidden = re_compile('[^{characters}]'.format(characters=re_escape(characters_allowed)))
+
+    def step(value, data: dict):
+        character = characters_forbidden.search(value)
+        if character:
+            return value, data_output(
+                status=ResponseStatus.error,
+                message='{key} must contain only characters {requirement_value}. '
+                        'Forbidden symbol used: {character}'.format(
+                    key=key,
+                    requirement_value=characters_allowed,
+                    character=character.group(),
+                ),
+            )
+        return value, None
+    return step
+
+
+def step_value_in(key: str, values):
+    values_set = None if values == 'systems' else frozenset(values)
+
+    def step(value, data: dict):
+        if values_set is None:
+            values_list = [system.name for system in systems_get()]
+            found = value in values_list
+        else:
+            values_list = values
+            try:
+                found = value in values_set
+            except TypeError:
+                found = False
+        if not found:
+            return value, data_output(
+                status=ResponseStatus.error,
+                message='{key} must be from the list {requirement_value}'.format(
+                    key=key,
+                    requirement_value=values_list,
+                ),
+            )
+        return value, None
+    return step
+
+
+def schema_compile_key(key: str, requirements: dict):
+    steps = []
+    if key == 'account_session_token':
+        steps.append(step_account_session_token(requirements=requirements))
+    if key == 'currency':
+        steps.append(step_currency(key=key))
+    for requirement_type, requirement_value in requirements.items():
+        if requirement_type == 'type' and requirement_value in steps_type:
+            steps.append(steps_type[requirement_value](key=key))
+        if requirement_type == 'length_min':
+            steps.append(step_length_min(key=key, length_min=requirement_value))
+        if requirement_type == 'length_max':
+            steps.append(step_length_max(key=key, length_max=requirement_value))
+        if requirement_type == 'characters_allowed':
+            steps.append(step_characters_allowed(key=key, characters_allowed=requirement_value))
+        if requirement_type == 'value_in':
+            steps.append(step_value_in(key=key, values=requirement_value))
+    return steps
+
+
+def schema_compile(schema: dict):
+    schema_steps = {key: schema_compile_key(key=key, requirements=requirements) for key, requirements in schema.items()}
+    keys_required = [key for key, requirements in schema.items() if 'optional' not in requirements.keys()]
+    return schema_steps, keys_required
+
+
+# Runs the compiled steps over the values, also used for the items of batch requests
+def data_validate(schema_steps: dict, keys_required: list, values: dict):
+    data = {}
+    for key, value in values.items():
+        steps = schema_steps.get(key)
+        if steps is None:
+            continue
+        for step in steps:
+            value, error = step(value, data)
+            if error:
+                return data, error
+        data[key] = value
+
+    for key in keys_required:
+        if key not in data:
+            return data, data_output(
+                status=ResponseStatus.error,
+                message='Missing key {key}'.format(
+                    key=key,
+                )
+            )
+    return data, None
+
+
 def data_input(schema: dict):
+    schema_steps, keys_required = schema_compile(schema=schema)
+
     def wrapper(function):
         def validator(*args):
-            data = {}
-
-            if request.is_json:
-                for key, value in request.json.items():
-                    if key not in schema.keys():
-                        continue
-
-                    requirements = schema[key]
-
-                    # Request requires an account
-                    if key == 'account_session_token':
-                        account_session = AccountSession.get_or_none(AccountSession.token == value)
-                        if not account_session:
-                            return data_output(
-                                status=ResponseStatus.error,
-                                message='Token does not exist',
-                            )
-                        account_session: AccountSession
-                        if account_session.closed:
-                            return data_output(
-                                status=ResponseStatus.error,
-                                message='Token expired',
-                            )
-
-                        account = account_session.account
-                        account.device = device_get(account_session=account_session)
-                        account.account_session = account_session
-
-                        for requirement_type, requirement_value in requirements.items():
-                            if requirement_type == 'account' and requirement_value == True:
-                                data['account'] = account
-                            if requirement_type == 'wallet' and requirement_value == True:
-                                wallet = Wallet.get_or_none(Wallet.account_id == account.id)
-                                if not wallet:
-                                    return data_output(
-                                        status=ResponseStatus.error,
-                                        message='Wallet not created for this account',
-                                    )
-                                wallet.account_session = account_session
-                                data['wallet'] = wallet
-
-                    if key == 'currency':
-                        currency = Currency.get_or_none(Currency.name == value)
-                        if not currency:
-                            return data_output(
-                                status=ResponseStatus.error,
-                                message='{key} must be from the list {currencies}'.format(
-                                    key=key,
-                                    currencies=[currency.name for currency in Currency.select()],
-                                ),
-                            )
-                        value = currency
-
-                    # Validation data
-                    for requirement_type, requirement_value in requirements.items():
-                        if requirement_type == 'type' and requirement_value == 'string':
-                            if type(value) != str:
-                                return data_output(
-                                    status=ResponseStatus.error,
-                                    message='Key {key} must match the type {key_type}'.format(
-                                        key=key,
-                                        key_type=requirement_value,
-                                    ),
-                                )
-                        if requirement_type == 'type' and requirement_value == 'integer':
-                            if not str(value).isdigit():
-                                return data_output(
-                                    status=ResponseStatus.error,
-                                    message='Key {key} must match the type {key_type}'.format(
-                                        key=key,
-                                        key_type=requirement_value,
-                                    ),
-                                )
-                            value = int(value)
-                        if requirement_type == 'type' and requirement_value == 'dictionary':
-                            try:
-                                value = loads(value)
-                            except TypeError:
-                                return data_output(
-                                    status=ResponseStatus.error,
-                                    message='Key {key} must match the type {key_type}'.format(
-                                        key=key,
-                                        key_type=requirement_value,
-                                    ),
-                                )
-                        if requirement_type == 'type' and requirement_value == 'boolean':
-                            if type(value) != bool:
-                                return data_output(
-                                    status=ResponseStatus.error,
-                                    message='Key {key} must match the type {key_type}'.format(
-                                        key=key,
-                                        key_type=requirement_value,
-                                    ),
-                                )
-                        if requirement_type == 'length_min':
-                            if len(value) < requirement_value:
-                                return data_output(
-                                    status=ResponseStatus.error,
-                                    message='Key length {key} be at least {requirement_value} characters. '
-                                            'Your length: {length}'.format(
-                                        key=key,
-                                        requirement_value=requirement_value,
-                                        length=len(value),
-                                    ),
-                                )
-                        if requirement_type == 'length_max':
-                            if len(value) > requirement_value:
-                                return data_output(
-                                    status=ResponseStatus.error,
-                                    message='Key length {key} must be no more than '
-                                            '{requirement_value} characters. Your length: {length}'.format(
-                                        key=key,
-                                        requirement_value=requirement_value,
-                                        length=len(value),
-                                    ),
-                                )
-                        if requirement_type == 'characters_allowed':
-                            for character in value:
-                                if character not in requirement_value:
-                                    return data_output(
-                                        status=ResponseStatus.error,
-                                        message='{key} must contain only characters {requirement_value}. '
-                                                'Forbidden symbol used: {character}'.format(
-                                            key=key,
-                                            requirement_value=requirement_value,
-                                            character=character,
-                                        ),
-                                    )
-                        if requirement_type == 'value_in':
-                            if requirement_value == 'systems':
-                                requirement_value = [
-                                    system.name for system in System.select()
-                                ]
-                            if value not in requirement_value:
-                                return data_output(
-                                    status=ResponseStatus.error,
-                                    message='{key} must be from the list {requirement_value}'.format(
-                                        key=key,
-                                        requirement_value=requirement_value,
-                                    ),
-                                )
-
-                    data[key] = value
-
-            for key, requirements in schema.items():
-                if key not in data.keys():
-                    if 'optional' in requirements.keys():
-                        continue
-                    return data_output(
-                        status=ResponseStatus.error,
-                        message='Missing key {key}'.format(
-                            key=key,
-                        )
-                    )
+            data, error = data_validate(
+                schema_steps=schema_steps,
+                keys_required=keys_required,
+                values=request.json if request.is_json else {},
+            )
+            if error:
+                return error
 
             data.pop('account_session_token', None)
 
@@ -15,6 +15,11 @@
 #
 
 
+from flask import g, has_request_context, request
+# noinspection PyPackageRequirements
+from werkzeug.http import quote_etag
+
+
 class ResponseStatus:
     successful = 'successful'
     error = 'error'
@@ -24,4 +29,15 @@ def data_output(status: str, message=None, **kwargs):
     response = kwargs
     response['status'] = status
     response['message'] = message if message else 'Request completed successfully'
+    if has_request_context():
+        # Counted by status in the metrics, see app/functions/metrics.py
+        g.response_status = status
     return response
+
+
+# Conditional GET: output() is called only when the client does not already have the version etag
+def data_output_etag(etag: str, output):
+    headers = {'ETag': quote_etag(etag)}
+    if request.if_none_match.contains(etag):
+        return '', 304, headers
+    return output(), 200, headers
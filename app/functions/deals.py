@@ -0,0 +1,60 @@
+#
+# (c) 2023, Yegor Yakubovich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+from app.database.pay.models import Wallet, Offer, Deal, DealActions, database_pay
+from app.database.transaction import transaction, on_commit
+from app.functions.order_book import order_book_candidates, order_book_update
+from config import DEALS_CANDIDATES
+
+
+# Candidates come from the in-memory order book, best rate first. Every attempt is its own short transaction
+# around the conditional UPDATE of the offer, a lost race (or a stale order book) costs one UPDATE and the next
+# candidate is tried. Must not be called inside another @transaction, it commits every successful attempt
+def deal_create(wallet: Wallet, system_id: int, offer_type: str, value: int):
+    candidates = order_book_candidates(
+        system_id=system_id,
+        offer_type=offer_type,
+        value=value,
+        wallet_id=wallet.id,
+        limit=DEALS_CANDIDATES,
+    )
+    for offer_id, rate in candidates:
+        deal = deal_attempt(wallet=wallet, offer_id=offer_id, rate=rate, value=value)
+        if deal:
+            return deal
+    return None
+
+
+@transaction(database_pay)
+def deal_attempt(wallet: Wallet, offer_id: int, rate: int, value: int):
+    if not Offer(id=offer_id).value_reserve(value=value, rate=rate):
+        return None
+    offer = Offer.get_by_id(offer_id)
+    on_commit(lambda: order_book_update(offer=offer))
+
+    deal = Deal.create(wallet=wallet, offer=offer, value=value, rate=rate)
+    deal.account_session = wallet.account_session
+    deal.action_create(
+        action=DealActions.create,
+        data={
+            'offer_id': offer.id,
+            'value': value,
+            'rate': rate,
+            'offer_value_to': offer.value_to,
+        },
+    )
+    return deal
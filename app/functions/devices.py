@@ -0,0 +1,116 @@
+#
+# (c) 2023, Yegor Yakubovich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+from atexit import register
+from collections import OrderedDict
+from logging import getLogger
+from os import getpid
+from threading import Event, Lock, Thread
+
+from peewee import DataError, IntegrityError
+
+from app.database.account.models import AccountSessionDevice, database_account
+from config import DEVICES_SEEN_ITEMS, DEVICES_FLUSH_INTERVAL, DEVICES_BATCH
+
+
+logger = getLogger('app.devices')
+
+
+class Devices:
+    # Devices are written behind the requests: a worker remembers the (session, user agent, ip) it has already
+    # seen, so a request records a device with a dict lookup and a new one is only appended to the pending list.
+    # A daemon thread inserts the pending devices in batches every interval, the unique index of the table drops
+    # devices written by other workers or before a restart
+    def __init__(self):
+        self._lock = Lock()
+        self._seen = OrderedDict()
+        self._pending = []
+        self._flush_event = Event()
+        self._pid = None
+
+    def record(self, account_session_id: int, name: str, ip_4: str):
+        key = (account_session_id, name, ip_4)
+        with self._lock:
+            if key in self._seen:
+                self._seen.move_to_end(key)
+                return
+            self._seen[key] = None
+            if len(self._seen) > DEVICES_SEEN_ITEMS:
+                self._seen.popitem(last=False)
+            self._pending.append(key)
+            # Threads do not survive the fork of uWSGI workers, every process starts its own writer
+            if self._pid != getpid():
+                self._pid = getpid()
+                Thread(target=self.run, name='devices', daemon=True).start()
+            if len(self._pending) >= DEVICES_BATCH:
+                self._flush_event.set()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return 0
+        refused = []
+        try:
+            with database_account.connection_context():
+                for number in range(0, len(pending), DEVICES_BATCH):
+                    batch = pending[number:number + DEVICES_BATCH]
+                    try:
+                        self.insert(rows=batch)
+                    except (DataError, IntegrityError):
+                        # One row the table refuses fails its whole batch, the others are written one by one
+                        for row in batch:
+                            try:
+                                self.insert(rows=[row])
+                            except (DataError, IntegrityError):
+                                refused.append(row)
+        except Exception:
+            # Forgotten, so the devices are recorded again by their next requests
+            logger.exception('Devices not written')
+            with self._lock:
+                for key in pending:
+                    self._seen.pop(key, None)
+            return 0
+        if refused:
+            # Kept as seen, they would be refused again
+            logger.error('Devices refused by the table: %s', refused)
+        return len(pending) - len(refused)
+
+    @staticmethod
+    def insert(rows: list):
+        AccountSessionDevice.insert_many(
+            rows,
+            fields=[AccountSessionDevice.account_session, AccountSessionDevice.name, AccountSessionDevice.ip_4],
+        ).on_conflict_ignore().execute()
+
+    def run(self):
+        while True:
+            self._flush_event.wait(DEVICES_FLUSH_INTERVAL)
+            self._flush_event.clear()
+            self.flush()
+
+
+devices = Devices()
+register(devices.flush)
+
+
+def device_record(account_session_id: int, name: str, ip_4: str):
+    devices.record(account_session_id=account_session_id, name=name, ip_4=ip_4)
+
+
+def devices_flush():
+    return devices.flush()
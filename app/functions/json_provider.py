@@ -0,0 +1,64 @@
+#
+# (c) 2023, Yegor Yakubovich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+from datetime import date, datetime
+from decimal import Decimal
+from json import dumps, loads
+
+from flask.json.provider import JSONProvider
+
+try:
+    # Optional, several times faster than the stdlib json module
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError('Object of type {type} is not JSON serializable'.format(type=type(value).__name__))
+
+
+# Responses are serialised with orjson when it is installed, otherwise with the stdlib.
+# Datetimes are written as ISO-8601 and keys are not sorted
+class JSONProviderFast(JSONProvider):
+    mimetype = 'application/json'
+
+    def dumps(self, obj, **kwargs):
+        if orjson and not kwargs:
+            return orjson.dumps(obj, default=json_default, option=orjson.OPT_NON_STR_KEYS).decode()
+        kwargs.setdefault('default', json_default)
+        kwargs.setdefault('ensure_ascii', False)
+        kwargs.setdefault('separators', (',', ':'))
+        return dumps(obj, **kwargs)
+
+    def dumps_bytes(self, obj):
+        if orjson:
+            return orjson.dumps(obj, default=json_default, option=orjson.OPT_NON_STR_KEYS)
+        return self.dumps(obj).encode()
+
+    def loads(self, s, **kwargs):
+        if orjson and not kwargs:
+            return orjson.loads(s)
+        return loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj), mimetype=self.mimetype)
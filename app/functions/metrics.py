@@ -0,0 +1,152 @@
+#
+# (c) 2023, Yegor Yakubovich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from threading import Lock
+from time import perf_counter, monotonic
+
+from flask import g, request
+
+from app.database import databases_stats
+from app.functions.cache import cache_create, uwsgi
+from config import METRICS_PUBLISH_INTERVAL
+
+
+buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Metrics:
+    # Recorded in process memory, a request costs a few dict updates. Every worker publishes a snapshot to the
+    # shared cache at most once per interval, /metrics renders the snapshots of all workers with a worker label,
+    # so a respawned worker shows up as an ordinary counter reset
+    def __init__(self):
+        self._lock = Lock()
+        self.durations = defaultdict(lambda: [0] * (len(buckets) + 1))
+        self.durations_sum = defaultdict(float)
+        self.responses = Counter()
+        self.time_publish = 0.0
+
+    def record(self, endpoint: str, duration: float, status_http: int, status: str):
+        with self._lock:
+            self.durations[endpoint][bisect_left(buckets, duration)] += 1
+            self.durations_sum[endpoint] += duration
+            self.responses[(endpoint, status_http, status)] += 1
+
+    def snapshot(self, databases: list):
+        with self._lock:
+            return {
+                'durations': {endpoint: list(counts) for endpoint, counts in self.durations.items()},
+                'durations_sum': dict(self.durations_sum),
+                'responses': [list(key) + [count] for key, count in self.responses.items()],
+                'databases': databases,
+            }
+
+
+metrics = Metrics()
+cache_metrics = cache_create(name='metrics', ttl=0, items=64)
+
+
+def worker_id():
+    return uwsgi.worker_id() if uwsgi else 1
+
+
+def workers_count():
+    return uwsgi.numproc if uwsgi else 1
+
+
+def metrics_publish():
+    metrics.time_publish = monotonic()
+    cache_metrics.set(str(worker_id()), metrics.snapshot(databases=databases_stats()))
+
+
+def metrics_start():
+    g.metrics_time_start = perf_counter()
+
+
+def metrics_finish(response):
+    time_start = g.pop('metrics_time_start', None)
+    if time_start is None:
+        return response
+    metrics.record(
+        endpoint=request.endpoint or 'none',
+        duration=perf_counter() - time_start,
+        status_http=response.status_code,
+        status=g.get('response_status', 'none'),
+    )
+    if monotonic() - metrics.time_publish >= METRICS_PUBLISH_INTERVAL:
+        metrics_publish()
+    return response
+
+
+def metric_header(lines: list, name: str, type_: str, description: str):
+    lines.append('# HELP {name} {description}'.format(name=name, description=description))
+    lines.append('# TYPE {name} {type_}'.format(name=name, type_=type_))
+
+
+def metrics_render():
+    metrics_publish()
+    snapshots = []
+    for worker in range(1, workers_count() + 1):
+        snapshot = cache_metrics.get(str(worker))
+        if snapshot:
+            snapshots.append((str(worker), snapshot))
+
+    lines = []
+    metric_header(lines, 'adecty_requests_total', 'counter', 'Requests by endpoint, HTTP status and response status')
+    for worker, snapshot in snapshots:
+        for endpoint, status_http, status, count in snapshot['responses']:
+            lines.append(
+                'adecty_requests_total{{worker="{worker}",endpoint="{endpoint}",http_status="{status_http}",'
+                'status="{status}"}} {count}'.format(
+                    worker=worker, endpoint=endpoint, status_http=status_http, status=status, count=count,
+                )
+            )
+
+    metric_header(lines, 'adecty_request_duration_seconds', 'histogram', 'Request latency by endpoint')
+    for worker, snapshot in snapshots:
+        for endpoint, counts in snapshot['durations'].items():
+            labels = 'worker="{worker}",endpoint="{endpoint}"'.format(worker=worker, endpoint=endpoint)
+            total = 0
+            for bucket, count in zip(buckets + ('+Inf',), counts):
+                total += count
+                lines.append('adecty_request_duration_seconds_bucket{{{labels},le="{bucket}"}} {total}'.format(
+                    labels=labels, bucket=bucket, total=total,
+                ))
+            lines.append('adecty_request_duration_seconds_sum{{{labels}}} {sum}'.format(
+                labels=labels, sum=snapshot['durations_sum'][endpoint],
+            ))
+            lines.append('adecty_request_duration_seconds_count{{{labels}}} {total}'.format(
+                labels=labels, total=total,
+            ))
+
+    databases = (
+        ('adecty_db_pool_connections_max', 'gauge', 'max_connections', 'Connections allowed in the pool'),
+        ('adecty_db_pool_connections_in_use', 'gauge', 'in_use', 'Connections checked out of the pool'),
+        ('adecty_db_pool_connections_idle', 'gauge', 'idle', 'Open connections waiting in the pool'),
+        ('adecty_db_pool_checkouts_total', 'counter', 'checkouts', 'Connections checked out since start'),
+        ('adecty_db_pool_wait_seconds_total', 'counter', 'wait_time_total', 'Time spent waiting for connections'),
+        ('adecty_db_pool_wait_seconds_max', 'gauge', 'wait_time_max', 'Longest wait for a connection'),
+    )
+    for name, type_, key, description in databases:
+        metric_header(lines, name, type_, description)
+        for worker, snapshot in snapshots:
+            for database in snapshot['databases']:
+                lines.append('{name}{{worker="{worker}",database="{database}"}} {value}'.format(
+                    name=name, worker=worker, database=database['database'], value=database.get(key, 0),
+                ))
+    return '\n'.join(lines) + '\n'
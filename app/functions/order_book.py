@@ -0,0 +1,218 @@
+#
+# (c) 2023, Yegor Yakubovich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+from bisect import bisect_left, insort
+from itertools import groupby, islice
+from operator import itemgetter
+from random import shuffle
+from threading import Lock
+from time import monotonic
+
+from app.database.pay.models import Offer, OfferType
+from app.functions.cache import cache_versions, cache_order_book, cache_lock
+from config import ORDER_BOOK_RELOAD_INTERVAL, ORDER_BOOK_CHANGES
+
+
+# Buyers of the balance (input offers) quote the highest rate first, sellers (output offers) the lowest
+rates_highest_best = {
+    OfferType.input: True,
+    OfferType.output: False,
+}
+
+
+# Active offers of one (system, type), entries (sort_rate, offer_id, rate, value_from, value_to, wallet_id) are kept
+# sorted, so the best offer is always entries[0]. sort_rate is the negated rate when the highest rate is the best
+class OrderBookSide:
+    def __init__(self, highest_best: bool):
+        self.highest_best = highest_best
+        self.entries = []
+
+    def entry_create(self, offer_id: int, rate: int, value_from: int, value_to: int, wallet_id: int):
+        return -rate if self.highest_best else rate, offer_id, rate, value_from, value_to, wallet_id
+
+    def add(self, entry: tuple):
+        insort(self.entries, entry)
+
+    def remove(self, entry: tuple):
+        index = bisect_left(self.entries, entry)
+        if index < len(self.entries) and self.entries[index] == entry:
+            del self.entries[index]
+
+    def depth(self, levels: int):
+        depth = []
+        for rate, entries in islice(groupby(self.entries, key=itemgetter(2)), levels):
+            values = [entry[4] for entry in entries]
+            depth.append({
+                'rate': rate,
+                'value': sum(values),
+                'offers': len(values),
+            })
+        return depth
+
+    # Offers covering the value in rate order, offers of the same rate are shuffled so concurrent deals
+    # spread over them instead of queueing on one row
+    def candidates(self, value: int, wallet_id: int, limit: int):
+        candidates = []
+        for rate, entries in groupby(self.entries, key=itemgetter(2)):
+            level = [entry[1] for entry in entries if entry[3] <= value <= entry[4] and entry[5] != wallet_id]
+            shuffle(level)
+            candidates.extend((offer_id, rate) for offer_id in level)
+            if len(candidates) >= limit:
+                break
+        return candidates[:limit]
+
+
+# Every worker keeps the active, non-deleted offers in memory. A committed offer change is appended to a shared log
+# of the latest ORDER_BOOK_CHANGES changes under the next version; every worker, the one that made the change
+# included, catches up by applying the changes past its version. The offers table is read again only when the log
+# has moved past the changes the worker missed, and every ORDER_BOOK_RELOAD_INTERVAL seconds to drop the drift
+# of changes committed in a different order than logged
+class OrderBook:
+    def __init__(self):
+        self.lock = Lock()
+        self.lock_actual = Lock()
+        self.version = None
+        self.time_loaded = 0.0
+        self.sides = {}
+        self.entries_by_offer_id = {}
+
+    def side_get(self, sides: dict, system_id: int, offer_type: str):
+        side = sides.get((system_id, offer_type))
+        if side is None:
+            side = sides[(system_id, offer_type)] = OrderBookSide(highest_best=rates_highest_best[offer_type])
+        return side
+
+    def load(self):
+        version = order_book_version()
+        offers = (Offer
+                  .select(Offer.id, Offer.system, Offer.type, Offer.rate, Offer.value_from, Offer.value_to,
+                          Offer.wallet)
+                  .where((Offer.active == True) & (Offer.deleted == False) & (Offer.value_to >= Offer.value_from))
+                  .tuples())
+
+        sides = {}
+        entries_by_offer_id = {}
+        for offer_id, system_id, offer_type, rate, value_from, value_to, wallet_id in offers:
+            side = self.side_get(sides=sides, system_id=system_id, offer_type=offer_type)
+            entry = side.entry_create(
+                offer_id=offer_id,
+                rate=rate,
+                value_from=value_from,
+                value_to=value_to,
+                wallet_id=wallet_id,
+            )
+            side.entries.append(entry)
+            entries_by_offer_id[offer_id] = (side, entry)
+        for side in sides.values():
+            side.entries.sort()
+
+        with self.lock:
+            self.sides = sides
+            self.entries_by_offer_id = entries_by_offer_id
+            self.version = version
+            self.time_loaded = monotonic()
+
+    # One thread at a time catches up, the others keep serving the book they have meanwhile
+    def actual(self):
+        version = order_book_version()
+        if version == self.version and monotonic() - self.time_loaded <= ORDER_BOOK_RELOAD_INTERVAL:
+            return self
+        if not self.lock_actual.acquire(blocking=False):
+            return self
+        try:
+            if monotonic() - self.time_loaded > ORDER_BOOK_RELOAD_INTERVAL or not self.changes_apply(version=version):
+                self.load()
+        finally:
+            self.lock_actual.release()
+        return self
+
+    def changes_apply(self, version: int):
+        if self.version is None or not 0 <= version - self.version <= ORDER_BOOK_CHANGES:
+            return False
+        for version_change in range(self.version + 1, version + 1):
+            change = cache_order_book.get(str(version_change % ORDER_BOOK_CHANGES))
+            if not change or change['version'] != version_change:
+                return False
+            with self.lock:
+                self.update(*change['offer'])
+                self.version = version_change
+        return True
+
+    def update(self, offer_id: int, system_id: int, offer_type: str, rate: int, value_from: int, value_to: int,
+               wallet_id: int, listed: bool):
+        side, entry = self.entries_by_offer_id.pop(offer_id, (None, None))
+        if side:
+            side.remove(entry=entry)
+        if listed:
+            side = self.side_get(sides=self.sides, system_id=system_id, offer_type=offer_type)
+            entry = side.entry_create(
+                offer_id=offer_id,
+                rate=rate,
+                value_from=value_from,
+                value_to=value_to,
+                wallet_id=wallet_id,
+            )
+            side.add(entry=entry)
+            self.entries_by_offer_id[offer_id] = (side, entry)
+
+    def depth(self, system_id: int, offer_type: str, levels: int):
+        with self.lock:
+            side = self.sides.get((system_id, offer_type))
+            return side.depth(levels=levels) if side else []
+
+    def candidates(self, system_id: int, offer_type: str, value: int, wallet_id: int, limit: int):
+        with self.lock:
+            side = self.sides.get((system_id, offer_type))
+            return side.candidates(value=value, wallet_id=wallet_id, limit=limit) if side else []
+
+
+order_book = OrderBook()
+
+
+def order_book_version():
+    version = cache_versions.get('order_book')
+    return version['version'] if version else 0
+
+
+def order_book_load():
+    order_book.load()
+
+
+def order_book_update(offer: Offer):
+    # An offer whose frozen funds were taken by deals below value_from can not match anymore
+    listed = offer.active and not offer.deleted and offer.value_to >= offer.value_from
+    change = [offer.id, offer.system_id, offer.type, offer.rate, offer.value_from, offer.value_to, offer.wallet_id,
+              bool(listed)]
+    with cache_lock:
+        version = order_book_version() + 1
+        cache_order_book.set(str(version % ORDER_BOOK_CHANGES), {'version': version, 'offer': change})
+        cache_versions.set('order_book', {'version': version})
+    order_book.actual()
+
+
+def order_book_depth(system_id: int, offer_type: str, levels: int):
+    return order_book.actual().depth(system_id=system_id, offer_type=offer_type, levels=levels)
+
+
+def order_book_candidates(system_id: int, offer_type: str, value: int, wallet_id: int, limit: int):
+    return order_book.actual().candidates(
+        system_id=system_id,
+        offer_type=offer_type,
+        value=value,
+        wallet_id=wallet_id,
+        limit=limit,
+    )
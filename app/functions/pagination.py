@@ -0,0 +1,86 @@
+#
+# (c) 2023, Yegor Yakubovich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+
+from config import PAGINATION_LIMIT, PAGINATION_LIMIT_MAX
+
+
+def cursor_create(id_: int):
+    return urlsafe_b64encode('id:{id}'.format(id=id_).encode()).decode()
+
+
+def cursor_read(cursor):
+    try:
+        prefix, id_ = urlsafe_b64decode(str(cursor).encode()).decode().split(':')
+    except (BinasciiError, UnicodeDecodeError, ValueError):
+        return None
+    if prefix != 'id' or not id_.isdigit():
+        return None
+    return int(id_)
+
+
+# Keyset of lists ordered by rate, ties broken by primary key
+def cursor_rate_create(rate: int, id_: int):
+    return urlsafe_b64encode('rate:{rate}:{id}'.format(rate=rate, id=id_).encode()).decode()
+
+
+def cursor_rate_read(cursor):
+    try:
+        prefix, rate, id_ = urlsafe_b64decode(str(cursor).encode()).decode().split(':')
+        rate, id_ = int(rate), int(id_)
+    except (BinasciiError, UnicodeDecodeError, ValueError):
+        return None
+    if prefix != 'rate':
+        return None
+    return rate, id_
+
+
+# Keyset of archived actions, ordered by partition month, then id
+def cursor_archive_create(month: str, id_: int):
+    return urlsafe_b64encode('archive:{month}:{id}'.format(month=month, id=id_).encode()).decode()
+
+
+def cursor_archive_read(cursor):
+    try:
+        prefix, month, id_ = urlsafe_b64decode(str(cursor).encode()).decode().split(':')
+        id_ = int(id_)
+    except (BinasciiError, UnicodeDecodeError, ValueError):
+        return None
+    if prefix != 'archive' or len(month) != 7:
+        return None
+    return month, id_
+
+
+def limit_get(limit: int = None):
+    return min(max(limit or PAGINATION_LIMIT, 1), PAGINATION_LIMIT_MAX)
+
+
+# Keyset pagination by primary key, the deprecated page is still served with an offset
+def paginate(query, field, page: int = None, after: int = None, limit: int = None):
+    limit = limit_get(limit=limit)
+    query = query.order_by(field)
+    if page:
+        query = query.offset(limit * page - limit)
+    elif after:
+        query = query.where(field > after)
+    rows = list(query.limit(limit + 1))
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, cursor_create(getattr(rows[-1], field.name))
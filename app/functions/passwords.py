@@ -0,0 +1,83 @@
+#
+# (c) 2023, Yegor Yakubovich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+from concurrent.futures import ProcessPoolExecutor
+from hashlib import pbkdf2_hmac
+from threading import BoundedSemaphore, Lock
+
+from config import SALT_PASSWORDS, PASSWORDS_PROCESSES, PASSWORDS_QUEUE
+
+try:
+    # Available only when running under uWSGI
+    import uwsgi
+except ImportError:
+    uwsgi = None
+
+
+class PasswordsBusy(Exception):
+    pass
+
+
+# PBKDF2 runs in a small process pool per worker instead of holding the request thread's GIL for the whole burst.
+# At most PASSWORDS_PROCESSES + PASSWORDS_QUEUE hashes are accepted, further requests are rejected at once. Under uWSGI
+# the total is kept below the worker's threads, so a login storm always leaves a thread for other requests
+class PasswordsPool:
+    def __init__(self, processes: int, queue: int, threads: int = None):
+        self.processes = processes
+        slots = processes + queue
+        if threads:
+            slots = max(1, min(slots, threads - 1))
+        self.slots = BoundedSemaphore(slots)
+        self.executor = None
+        self.lock = Lock()
+
+    def executor_get(self):
+        # Created on first use, so the pool belongs to the worker process and not to the uWSGI master
+        with self.lock:
+            if not self.executor:
+                self.executor = ProcessPoolExecutor(max_workers=self.processes)
+            return self.executor
+
+    def hash(self, password: str, iterations: int):
+        if not self.slots.acquire(blocking=False):
+            raise PasswordsBusy()
+        try:
+            future = self.executor_get().submit(password_hash_compute, password, iterations)
+        except Exception:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        return future.result()
+
+
+def password_hash_compute(password: str, iterations: int):
+    return pbkdf2_hmac(
+        hash_name='sha256',
+        password=password.encode('utf-8'),
+        salt=SALT_PASSWORDS.encode('utf-8'),
+        iterations=iterations,
+    ).hex()
+
+
+def threads_get():
+    if not uwsgi:
+        return None
+    threads = uwsgi.opt.get('threads')
+    return int(threads) if threads else 1
+
+
+passwords_pool = PasswordsPool(processes=PASSWORDS_PROCESSES, queue=PASSWORDS_QUEUE, threads=threads_get())
@@ -0,0 +1,159 @@
+#
+# (c) 2023, Yegor Yakubovich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+from itertools import groupby
+from json import dumps, loads
+from operator import itemgetter
+
+from peewee import JOIN, fn
+
+from app.database import databases_close
+from app.database.pay.models import Wallet, WalletAction, WalletCheckpoint, WalletActions, database_pay
+from config import RECONCILIATION_PROCESSES, RECONCILIATION_CHUNK
+
+
+# Wallet actions that record the balances before and after the change
+actions_balance = (WalletActions.balance_frozen,)
+
+
+# Replays the balance actions of the wallets [wallet_id_start, wallet_id_end) in one consistent read: every action
+# must start from the balances the previous one ended with, and the last one must end with the balances of the
+# wallet. Incremental runs start from each wallet's checkpoint, full audits take the opening balances from the
+# first action (balances credited before any action are not recorded). Wallets that agree get a new checkpoint
+def wallets_reconcile(wallet_id_start: int, wallet_id_end: int, incremental: bool = True):
+    with database_pay.connection_context():
+        with database_pay.atomic():
+            wallets_count, actions_count, mismatches, checkpoints = wallets_replay(
+                wallet_id_start=wallet_id_start,
+                wallet_id_end=wallet_id_end,
+                incremental=incremental,
+            )
+        # Written after the read transaction, so the replay holds no locks
+        with database_pay.atomic():
+            for number in range(0, len(checkpoints), 1000):
+                WalletCheckpoint.insert_many(checkpoints[number:number + 1000]).on_conflict_replace().execute()
+
+    return {
+        'wallets': wallets_count,
+        'actions': actions_count,
+        'checkpoints': len(checkpoints),
+        'mismatches': mismatches,
+    }
+
+
+def wallets_replay(wallet_id_start: int, wallet_id_end: int, incremental: bool):
+    mismatches = []
+    checkpoints = []
+    actions_count = 0
+    wallets_count = 0
+    wallets = (Wallet
+               .select(Wallet.id, Wallet.balance, Wallet.balance_frozen)
+               .where((Wallet.id >= wallet_id_start) & (Wallet.id < wallet_id_end))
+               .order_by(Wallet.id)
+               .tuples())
+    actions = (WalletAction
+               .select(WalletAction.wallet, WalletAction.id, WalletAction.data)
+               .where((WalletAction.wallet >= wallet_id_start) &
+                      (WalletAction.wallet < wallet_id_end) &
+                      (WalletAction.action.in_(actions_balance))))
+    checkpoints_by_wallet_id = {}
+    if incremental:
+        checkpoints_by_wallet_id = {
+            wallet_id: (action_id, (balance, balance_frozen)) for wallet_id, action_id, balance, balance_frozen in
+            WalletCheckpoint.select(
+                WalletCheckpoint.wallet, WalletCheckpoint.action_id,
+                WalletCheckpoint.balance, WalletCheckpoint.balance_frozen,
+            ).where(
+                (WalletCheckpoint.wallet >= wallet_id_start) & (WalletCheckpoint.wallet < wallet_id_end)
+            ).tuples()
+        }
+        actions = actions.join(
+            WalletCheckpoint, JOIN.LEFT_OUTER, on=(WalletCheckpoint.wallet == WalletAction.wallet),
+        ).where(WalletAction.id > fn.COALESCE(WalletCheckpoint.action_id, 0))
+    actions = groupby(actions.order_by(WalletAction.wallet, WalletAction.id).tuples().iterator(), key=itemgetter(0))
+
+    wallet_actions = next(actions, None)
+    for wallet_id, balance, balance_frozen in wallets:
+        wallets_count += 1
+        action_id, state = checkpoints_by_wallet_id.get(wallet_id, (0, None))
+        while wallet_actions and wallet_actions[0] < wallet_id:
+            wallet_actions = next(actions, None)
+        if wallet_actions and wallet_actions[0] == wallet_id:
+            mismatches_wallet = len(mismatches)
+            for _, action_id, data in wallet_actions[1]:
+                actions_count += 1
+                data = loads(data)
+                state_before = (data.get('balance_before'), data.get('balance_frozen_before'))
+                if state is not None and state_before != state:
+                    mismatches.append(mismatch_create(wallet_id, action_id, expected=state, actual=state_before))
+                state = (data.get('balance'), data.get('balance_frozen'))
+            wallet_actions = next(actions, None)
+            if len(mismatches) != mismatches_wallet:
+                continue
+        if state is not None and state != (balance, balance_frozen):
+            mismatches.append(mismatch_create(wallet_id, None, expected=state, actual=(balance, balance_frozen)))
+            continue
+        checkpoints.append({
+            'wallet': wallet_id,
+            'action_id': action_id,
+            'balance': balance,
+            'balance_frozen': balance_frozen,
+            'datetime': datetime.now(timezone.utc),
+        })
+
+    return wallets_count, actions_count, mismatches, checkpoints
+
+
+# action_id None: the wallet row does not match the balances its actions end with
+def mismatch_create(wallet_id: int, action_id, expected: tuple, actual: tuple):
+    return {
+        'wallet_id': wallet_id,
+        'action_id': action_id,
+        'balance_expected': expected[0],
+        'balance_frozen_expected': expected[1],
+        'balance': actual[0],
+        'balance_frozen': actual[1],
+    }
+
+
+# Wallet id ranges are reconciled in parallel, mismatches are written to the report (one JSON object per line)
+# as soon as their range is done
+def reconciliation_run(report, incremental: bool = True, processes: int = RECONCILIATION_PROCESSES,
+                       chunk: int = RECONCILIATION_CHUNK):
+    with database_pay.connection_context():
+        wallet_id_max = Wallet.select(fn.MAX(Wallet.id)).scalar() or 0
+    # Forked processes open their own connections
+    databases_close()
+
+    totals = {'wallets': 0, 'actions': 0, 'checkpoints': 0, 'mismatches': 0}
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = [
+            executor.submit(wallets_reconcile, wallet_id_start, wallet_id_start + chunk, incremental)
+            for wallet_id_start in range(1, wallet_id_max + 1, chunk)
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            for mismatch in result['mismatches']:
+                report.write(dumps(mismatch) + '\n')
+            report.flush()
+            totals['wallets'] += result['wallets']
+            totals['actions'] += result['actions']
+            totals['checkpoints'] += result['checkpoints']
+            totals['mismatches'] += len(result['mismatches'])
+    return totals
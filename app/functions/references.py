@@ -0,0 +1,129 @@
+#
+# (c) 2023, Yegor Yakubovich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+from hashlib import sha1
+from json import dumps
+from threading import Lock
+from time import monotonic
+
+from app.database.pay import Currency, System
+from app.functions.cache import cache_versions
+from config import CACHE_REFERENCES_TTL
+
+
+# Currencies and systems are small and rarely change, every worker keeps them in memory. Workers reload them
+# when the shared version is bumped by references_invalidate() or after CACHE_REFERENCES_TTL seconds.
+# Nothing in the service edits them yet: they are changed directly in the database, which a command run outside
+# uWSGI cannot signal through its shared cache, so such edits reach the workers by the TTL alone. Code that comes to
+# edit them calls references_invalidate() once committed
+class References:
+    def __init__(self):
+        self.lock = Lock()
+        self.version = None
+        self.time_loaded = 0.0
+        self.currencies = []
+        self.currencies_by_id = {}
+        self.currencies_by_name = {}
+        self.systems = []
+        self.systems_by_id = {}
+        self.systems_by_name = {}
+        self.systems_by_currency_id = {}
+        self.currencies_etag = None
+        self.systems_etags_by_currency_id = {}
+
+    def load(self):
+        version = references_version()
+        currencies = list(Currency.select().order_by(Currency.id))
+        systems = list(System.select().order_by(System.id))
+
+        currencies_by_id = {currency.id: currency for currency in currencies}
+        systems_by_currency_id = {currency.id: [] for currency in currencies}
+        for system in systems:
+            system.currency = currencies_by_id[system.currency_id]
+            systems_by_currency_id[system.currency_id].append(system)
+
+        with self.lock:
+            self.currencies = currencies
+            self.currencies_by_id = currencies_by_id
+            self.currencies_by_name = {}
+            for currency in reversed(currencies):
+                self.currencies_by_name[currency.name] = currency
+            self.systems = systems
+            self.systems_by_id = {system.id: system for system in systems}
+            self.systems_by_name = {}
+            for system in reversed(systems):
+                self.systems_by_name[system.name] = system
+            self.systems_by_currency_id = systems_by_currency_id
+            self.currencies_etag = etag_create(rows=currencies)
+            self.systems_etags_by_currency_id = {
+                currency_id: etag_create(rows=systems_currency)
+                for currency_id, systems_currency in systems_by_currency_id.items()
+            }
+            self.version = version
+            self.time_loaded = monotonic()
+
+    def actual(self):
+        if self.version != references_version() or monotonic() - self.time_loaded > CACHE_REFERENCES_TTL:
+            self.load()
+        return self
+
+
+references = References()
+
+
+# Content version of a table, it changes only when the rows do
+def etag_create(rows: list):
+    return sha1(dumps([row.__data__ for row in rows], sort_keys=True, default=str).encode()).hexdigest()
+
+
+def references_version():
+    version = cache_versions.get('references')
+    return version['version'] if version else 0
+
+
+def references_invalidate():
+    cache_versions.set('references', {'version': references_version() + 1})
+
+
+def references_load():
+    references.load()
+
+
+def currencies_get():
+    return references.actual().currencies
+
+
+def currency_get(name: str):
+    return references.actual().currencies_by_name.get(name)
+
+
+def currencies_etag():
+    return references.actual().currencies_etag
+
+
+def systems_etag(currency: Currency):
+    return references.actual().systems_etags_by_currency_id.get(currency.id, etag_create(rows=[]))
+
+
+def systems_get(currency: Currency = None):
+    if currency is None:
+        return references.actual().systems
+    return references.actual().systems_by_currency_id.get(currency.id, [])
+
+
+def system_get(name: str):
+    return references.actual().systems_by_name.get(name)
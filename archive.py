@@ -0,0 +1,44 @@
+#
+# (c) 2023, Yegor Yakubovich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+# Moves action rows older than [archive] months_hot months to the partition files: python archive.py
+# Run it from cron, for example once a day. Reads go through app/database/archive.py
+
+
+from argparse import ArgumentParser
+
+from app.database.archive import actions_archive
+from config import ARCHIVE_MONTHS_HOT, ARCHIVE_DELETE_DELAY
+
+
+def archive():
+    parser = ArgumentParser()
+    parser.add_argument('--months_hot', type=int, default=ARCHIVE_MONTHS_HOT)
+    parser.add_argument('--delete_delay', type=int, default=ARCHIVE_DELETE_DELAY)
+    args = parser.parse_args()
+
+    for table, month, rows, deleted in actions_archive(months_hot=args.months_hot, delete_delay=args.delete_delay):
+        print('{table} {month}: {rows} rows archived, {deleted} deleted'.format(
+            table=table,
+            month=month,
+            rows='already' if rows is None else rows,
+            deleted=deleted,
+        ))
+
+
+if __name__ == "__main__":
+    archive()
@@ -0,0 +1,115 @@
+#
+# (c) 2023, Yegor Yakubovich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+# Batch API against single requests on the local database stand-in: python -m benchmarks.batch
+# The same offer updates are sent once as one request per offer and once as batches, the throughput and the
+# number of queries of both are reported
+
+
+from argparse import ArgumentParser
+from datetime import datetime, timezone
+from logging import getLogger, WARNING
+from re import search
+from time import perf_counter
+
+from app import app_create
+from app.database.pay.models import Offer, OfferType
+from benchmarks.database import databases_standin, standin_seed
+from config import BATCH_OPERATIONS_MAX
+from migrate import migrate
+
+
+def seed(offers: int):
+    (token,), wallet, system = standin_seed(username='benchmark_batch')
+    offers_ids = [
+        Offer.create(
+            type=OfferType.output,
+            wallet=wallet,
+            system=system,
+            system_data='{}',
+            value_from=1,
+            value_to=0,
+            rate=100,
+            updated_datetime=datetime.now(timezone.utc),
+        ).id for _ in range(offers)
+    ]
+    return token, offers_ids
+
+
+def queries_count(response) -> int:
+    return int(search(r'"(\d+) queries"', response.headers['Server-Timing']).group(1))
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--offers', type=int, default=BATCH_OPERATIONS_MAX)
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+
+    getLogger('app.queries').setLevel(WARNING)
+    databases_standin()
+    migrate()
+    app = app_create()
+    token, offers_ids = seed(offers=args.offers)
+    client = app.test_client()
+
+    queries_single, time_start = 0, perf_counter()
+    for round_ in range(args.rounds):
+        for offer_id in offers_ids:
+            response = client.get('/pay/wallet/offer/update', json={
+                'account_session_token': token,
+                'offer_id': offer_id,
+                'rate': 101 + round_,
+            })
+            if response.get_json()['status'] != 'successful':
+                raise AssertionError(response.get_json())
+            queries_single += queries_count(response)
+    time_single = perf_counter() - time_start
+
+    queries_batch, time_start = 0, perf_counter()
+    for round_ in range(args.rounds):
+        for number in range(0, len(offers_ids), BATCH_OPERATIONS_MAX):
+            response = client.get('/pay/wallet/batch/execute', json={
+                'account_session_token': token,
+                'operations': [
+                    {'operation': 'offer_update', 'offer_id': offer_id, 'rate': 201 + round_}
+                    for offer_id in offers_ids[number:number + BATCH_OPERATIONS_MAX]
+                ],
+            })
+            results = response.get_json()['results']
+            if any(result['status'] != 'successful' for result in results):
+                raise AssertionError(results)
+            queries_batch += queries_count(response)
+    time_batch = perf_counter() - time_start
+
+    rates = {offer.rate for offer in Offer.select().where(Offer.id.in_(offers_ids))}
+    if rates != {200 + args.rounds}:
+        raise AssertionError('Rates after the batches: {rates}'.format(rates=rates))
+
+    updates = args.offers * args.rounds
+    for name, time_total, queries in (('single', time_single, queries_single), ('batch', time_batch, queries_batch)):
+        print('{name}: {updates} offer updates, {rate:.0f} offers/s, {queries:.2f} queries per offer'.format(
+            name=name,
+            updates=updates,
+            rate=updates / time_total,
+            queries=queries / updates,
+        ))
+    print('speedup {speedup:.1f}x'.format(speedup=time_single / time_batch))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+#
+# (c) 2023, Yegor Yakubovich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+# Per-request cost of data_input validation, without the database: python -m benchmarks.data_input
+
+
+from timeit import repeat
+
+from flask import Flask
+
+from app.blueprints.account import password_charset_allowed, username_charset_allowed
+from app.functions.data_input import data_input
+
+
+schema = {
+    'username': {'type': 'string', 'length_min': 8, 'length_max': 32, 'characters_allowed': username_charset_allowed},
+    'password': {'type': 'string', 'length_min': 8, 'length_max': 64, 'characters_allowed': password_charset_allowed},
+    'offer_id': {'type': 'integer'},
+    'active': {'type': 'boolean', 'optional': True},
+    'offer_type': {'value_in': ['input', 'output']},
+}
+
+payloads = {
+    'valid': {
+        'username': 'username_benchmark',
+        'password': 'Password.Benchmark_0123456789' * 2,
+        'offer_id': '12345',
+        'active': True,
+        'offer_type': 'output',
+    },
+    'invalid': {
+        'username': 'username_benchmark',
+        'password': 'Password.Benchmark_0123456789' * 2 + ' ',
+        'offer_id': '12345',
+        'offer_type': 'output',
+    },
+}
+
+
+def view(**kwargs):
+    return kwargs
+
+
+def main(number: int = 20000):
+    app = Flask(__name__)
+    validator = data_input(schema=schema)(view)
+    for name, payload in payloads.items():
+        with app.test_request_context(json=payload):
+            validator()
+            timing = min(repeat(validator, number=number, repeat=5)) / number
+        print('{name}: {timing:.2f} us per request'.format(name=name, timing=timing * 1000000))
+
+
+if __name__ == '__main__':
+    main()
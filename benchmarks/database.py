@@ -0,0 +1,70 @@
+#
+# (c) 2023, Yegor Yakubovich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+# Local stand-in for the MySQL databases, so benchmarks run without a network or a database server
+
+
+from os import path
+from tempfile import mkdtemp
+
+from peewee import SqliteDatabase
+
+from app.database.account.models import Account, AccountSession, database_account, token_create
+from app.database.instrumentation import QueriesInstrumented
+from app.database.pay.models import Currency, System, Wallet, database_pay
+
+
+class DatabaseStandIn(QueriesInstrumented, SqliteDatabase):
+    def __init__(self, database: str):
+        super().__init__(database, check_same_thread=False, pragmas={'journal_mode': 'wal', 'synchronous': 'off'})
+        self.queries = 0
+
+    def execute_sql(self, sql, params=None):
+        self.queries += 1
+        return super().execute_sql(sql, params)
+
+    def stats(self):
+        return {
+            'database': self.database,
+            'queries': self.queries,
+        }
+
+    def close_all(self):
+        if not self.is_closed():
+            self.close()
+
+
+def databases_standin(directory: str = None):
+    directory = directory or mkdtemp(prefix='adecty_benchmark_')
+    databases = []
+    for database_proxy, name in ((database_account, 'adecty_account'), (database_pay, 'adecty_pay')):
+        database = DatabaseStandIn(path.join(directory, '{name}.sqlite'.format(name=name)))
+        database_proxy.initialize(database)
+        databases.append(database)
+    return databases
+
+
+# An account with its session tokens and wallet, and a currency with one system, on the migrated stand-in
+def standin_seed(username: str, sessions: int = 1):
+    account = Account.create(username=username, password='', password_iterations=1)
+    tokens = [token_create() for _ in range(sessions)]
+    for token in tokens:
+        AccountSession.create(account=account, token=token)
+    wallet = Wallet.create(account_id=account.id)
+    currency = Currency.create(name='bench', description='Benchmark', icon='B', places_decimal=2)
+    system = System.create(currency=currency, name='bench', description='Benchmark', data='[]')
+    return tokens, wallet, system
@@ -0,0 +1,160 @@
+#
+# (c) 2023, Yegor Yakubovich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+# Contention of deal matching: python -m benchmarks.deals [--standin]
+# Many threads match deals of random values against a few offers quoted at the same rate, the worst case for
+# row lock convoys. No offer may give away more than it had frozen, every deal must have its DealAction and the
+# funds taken from the offers must add up to the values of the deals
+
+
+from argparse import ArgumentParser
+from datetime import datetime, timezone
+from random import Random
+from threading import Thread
+from time import perf_counter
+
+from flask import Flask
+
+from app.database.account.models import AccountSession
+from app.database.pay.models import Currency, System, Wallet, Offer, OfferType, Deal, DealAction, database_pay
+from app.functions.deals import deal_create
+from app.functions.order_book import order_book_load
+
+
+def seed(offers: int, value_to: int, threads: int):
+    currency = Currency.create(name='bench', description='Benchmark', icon='B', places_decimal=2)
+    system = System.create(currency=currency, name='bench', description='Benchmark', data='[]')
+    wallet_maker = Wallet.create(balance=0, balance_frozen=offers * value_to)
+    offers_ids = [
+        Offer.create(
+            type=OfferType.output,
+            wallet=wallet_maker,
+            system=system,
+            system_data='{}',
+            value_from=1,
+            value_to=value_to,
+            rate=100,
+            updated_datetime=datetime.now(timezone.utc),
+            active=True,
+        ).id for _ in range(offers)
+    ]
+    wallets_ids = [Wallet.create().id for _ in range(threads)]
+    return currency, system, wallet_maker, offers_ids, wallets_ids
+
+
+def worker(app: Flask, wallet_id: int, system_id: int, attempts: int, seed_: int, results: list):
+    random = Random(seed_)
+    wallet = Wallet(id=wallet_id)
+    wallet.account_session = AccountSession(id=0)
+    deals, misses, latencies = 0, 0, []
+    with app.app_context(), database_pay.connection_context():
+        for _ in range(attempts):
+            time_start = perf_counter()
+            deal = deal_create(
+                wallet=wallet,
+                system_id=system_id,
+                offer_type=OfferType.output,
+                value=random.randint(1, 100),
+            )
+            latencies.append(perf_counter() - time_start)
+            if deal:
+                deals += 1
+            else:
+                misses += 1
+    results.append((deals, misses, latencies))
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--attempts', type=int, default=200, help='match attempts per thread')
+    parser.add_argument('--offers', type=int, default=4)
+    parser.add_argument('--value_to', type=int, default=100000, help='frozen value of every offer')
+    parser.add_argument('--standin', action='store_true', help='use the local database stand-in')
+    args = parser.parse_args()
+
+    if args.standin:
+        from benchmarks.database import databases_standin
+        from migrate import migrate
+        databases_standin()
+        migrate()
+
+    app = Flask(__name__)
+    with database_pay.connection_context():
+        currency, system, wallet_maker, offers_ids, wallets_ids = seed(
+            offers=args.offers,
+            value_to=args.value_to,
+            threads=args.threads,
+        )
+        order_book_load()
+
+    results = []
+    workers = [
+        Thread(target=worker, args=(app, wallet_id, system.id, args.attempts, number, results))
+        for number, wallet_id in enumerate(wallets_ids)
+    ]
+    time_start = perf_counter()
+    [worker_.start() for worker_ in workers]
+    [worker_.join() for worker_ in workers]
+    time_total = perf_counter() - time_start
+
+    deals = sum(result[0] for result in results)
+    latencies = sorted(latency for result in results for latency in result[2])
+    print('{attempts} match attempts, {deals} deals, {misses} without an offer, {rate:.0f} attempts/s, '
+          'p50 {p50:.2f} ms, p99 {p99:.2f} ms'.format(
+              attempts=len(latencies),
+              deals=deals,
+              misses=sum(result[1] for result in results),
+              rate=len(latencies) / time_total,
+              p50=latencies[len(latencies) // 2] * 1000,
+              p99=latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+          ))
+
+    with database_pay.connection_context():
+        offers = list(Offer.select().where(Offer.id.in_(offers_ids)))
+        deals_query = Deal.select().where(Deal.offer.in_(offers_ids))
+        deals_values = {offer_id: 0 for offer_id in offers_ids}
+        for deal in deals_query:
+            deals_values[deal.offer_id] += deal.value
+        deals_count = deals_query.count()
+        deals_actions = DealAction.select().where(DealAction.deal.in_(deals_query)).count()
+
+        DealAction.delete().where(DealAction.deal.in_(deals_query)).execute()
+        Deal.delete().where(Deal.offer.in_(offers_ids)).execute()
+        Offer.delete().where(Offer.id.in_(offers_ids)).execute()
+        Wallet.delete().where(Wallet.id.in_(wallets_ids + [wallet_maker.id])).execute()
+        system.delete_instance()
+        currency.delete_instance()
+
+    if len(results) != args.threads or deals_count != deals or deals_actions != deals:
+        raise AssertionError('{deals} deals reported, {deals_count} stored with {deals_actions} actions'.format(
+            deals=deals,
+            deals_count=deals_count,
+            deals_actions=deals_actions,
+        ))
+    for offer in offers:
+        if offer.value_to < 0 or offer.value_to + deals_values[offer.id] != args.value_to:
+            raise AssertionError('Offer {id}: value_to {value_to}, deals {deals_value}'.format(
+                id=offer.id,
+                value_to=offer.value_to,
+                deals_value=deals_values[offer.id],
+            ))
+    print('offers value_to and deals: consistent')
+
+
+if __name__ == '__main__':
+    main()
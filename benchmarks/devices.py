@@ -0,0 +1,78 @@
+#
+# (c) 2023, Yegor Yakubovich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+# Device tracking of authenticated requests on the local database stand-in: python -m benchmarks.devices
+# Sessions call /account/get from a few user agents. Reports requests/s and queries per request, which must not
+# include device lookups, then checks every (session, user agent, ip) was written exactly once
+
+
+from argparse import ArgumentParser
+from logging import getLogger, WARNING
+from time import perf_counter
+
+from app import app_create
+from app.database.account.models import AccountSessionDevice
+from app.functions.devices import devices_flush
+from benchmarks.batch import queries_count
+from benchmarks.database import databases_standin, standin_seed
+from migrate import migrate
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--sessions', type=int, default=100)
+    parser.add_argument('--agents', type=int, default=5, help='user agents per session')
+    parser.add_argument('--requests', type=int, default=20000)
+    args = parser.parse_args()
+
+    getLogger('app.queries').setLevel(WARNING)
+    databases_standin()
+    migrate()
+    app = app_create()
+    tokens, _, _ = standin_seed(username='benchmark_devices', sessions=args.sessions)
+    client = app.test_client()
+
+    queries, time_start = 0, perf_counter()
+    for number in range(args.requests):
+        response = client.get(
+            '/account/get',
+            json={'account_session_token': tokens[number % args.sessions]},
+            headers={'User-Agent': 'benchmark/{agent}'.format(agent=number // args.sessions % args.agents)},
+        )
+        if response.get_json()['status'] != 'successful':
+            raise AssertionError(response.get_json())
+        queries += queries_count(response)
+    time_total = perf_counter() - time_start
+
+    devices_flush()
+    devices = AccountSessionDevice.select().count()
+    devices_expected = args.sessions * min(args.agents, max(1, args.requests // args.sessions))
+    print('{requests} requests: {rate:.0f} requests/s, {queries:.3f} queries per request, {devices} devices'.format(
+        requests=args.requests,
+        rate=args.requests / time_total,
+        queries=queries / args.requests,
+        devices=devices,
+    ))
+    if devices != devices_expected:
+        raise AssertionError('{devices} devices written, {expected} expected'.format(
+            devices=devices,
+            expected=devices_expected,
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,226 @@
+#
+# (c) 2023, Yegor Yakubovich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+# Endpoint benchmark against a local database stand-in, no network needed: python -m benchmarks.endpoints
+# Boots the application from app_create(), seeds accounts, sessions, wallets, offers and actions, drives every
+# endpoint and writes req/s, latency percentiles and queries per request to a JSON file for diffing.
+
+
+from argparse import ArgumentParser
+from datetime import datetime, timezone
+from json import dumps
+from logging import getLogger, WARNING
+from platform import python_version
+from random import Random
+from time import perf_counter
+
+from app import app_create
+from app.database.account.models import Account, AccountSession, token_create
+from app.database.pay.models import Currency, System, Wallet, WalletAction, Offer, OfferType
+from app.functions.passwords import password_hash_compute
+from app.functions.order_book import order_book_load
+from app.functions.references import references_load
+from benchmarks.database import databases_standin
+from config import PASSWORDS_ITERATIONS
+from migrate import migrate
+
+
+password = 'benchmark_password'
+
+
+def rows_insert(model, rows: list, chunk: int = 500):
+    for index in range(0, len(rows), chunk):
+        model.insert_many(rows[index:index + chunk]).execute()
+
+
+def seed(accounts: int, offers: int, actions: int):
+    now = datetime.now(timezone.utc)
+    currency = Currency.create(name='usd', description='US dollar', icon='$', places_decimal=2)
+    for name in ('card', 'bank', 'cash'):
+        System.create(currency=currency, name=name, description=name, data=dumps([{'name': 'number'}]))
+    references_load()
+    systems = list(System.select())
+
+    # The salt is global, one hash serves every seeded account
+    password_hashed = password_hash_compute(password, PASSWORDS_ITERATIONS)
+    rows_insert(Account, [
+        {
+            'username': 'benchmark{number:05d}'.format(number=number),
+            'password': password_hashed,
+            'password_iterations': PASSWORDS_ITERATIONS,
+        } for number in range(accounts)
+    ])
+    accounts_ids = [account.id for account in Account.select(Account.id).order_by(Account.id)]
+    tokens = [token_create() for _ in accounts_ids]
+    rows_insert(AccountSession, [
+        {'account': account_id, 'token': token} for account_id, token in zip(accounts_ids, tokens)
+    ])
+    rows_insert(Wallet, [
+        {'account_id': account_id, 'balance': 10 ** 12, 'balance_frozen': 0} for account_id in accounts_ids
+    ])
+    wallets_ids = [wallet.id for wallet in Wallet.select(Wallet.id).order_by(Wallet.id)]
+    rows_insert(Offer, [
+        {
+            'wallet': wallet_id,
+            'type': (OfferType.input, OfferType.output)[number % 2],
+            'system': systems[number % len(systems)],
+            'system_data': dumps({'number': str(number)}),
+            'value_from': 1000,
+            'value_to': 100000,
+            'rate': 100 + number,
+            'updated_datetime': now,
+            'active': True,
+        } for wallet_id in wallets_ids for number in range(offers)
+    ])
+    rows_insert(WalletAction, [
+        {
+            'wallet': wallet_id,
+            'account_session_id': 0,
+            'action': 'benchmark',
+            'data': dumps({'number': number}),
+            'datetime': now,
+        } for wallet_id in wallets_ids for number in range(actions)
+    ])
+    order_book_load()
+    offers_ids = {}
+    for offer in Offer.select(Offer.id, Offer.wallet).tuples():
+        offers_ids.setdefault(offer[1], []).append(offer[0])
+    return [
+        {
+            'username': 'benchmark{number:05d}'.format(number=number),
+            'token': token,
+            'offers_ids': offers_ids.get(wallet_id, []),
+        } for number, (token, wallet_id) in enumerate(zip(tokens, wallets_ids))
+    ]
+
+
+scenarios = (
+    ('/account/session/create', 20, lambda user, random: {'username': user['username'], 'password': password}),
+    ('/account/get', 1000, lambda user, random: {'account_session_token': user['token']}),
+    ('/pay/currencies/get', 1000, lambda user, random: {}),
+    ('/pay/systems/get', 1000, lambda user, random: {'currency': 'usd'}),
+    ('/pay/wallet/get', 1000, lambda user, random: {'account_session_token': user['token']}),
+    ('/pay/wallet/actions/get', 1000, lambda user, random: {
+        'account_session_token': user['token'],
+        'page': random.randint(1, 20),
+    }),
+    ('/pay/wallet/offers/get', 1000, lambda user, random: {'account_session_token': user['token'], 'page': 1}),
+    ('/pay/wallet/offer/get', 1000, lambda user, random: {
+        'account_session_token': user['token'],
+        'offer_id': random.choice(user['offers_ids']),
+    }),
+    ('/pay/wallet/offer/create', 500, lambda user, random: {
+        'account_session_token': user['token'],
+        'offer_type': OfferType.output,
+        'system_name': 'card',
+        'system_data': dumps({'number': '1'}),
+        'value_from': 1000,
+        'value_to': 5000,
+        'rate': random.randint(90, 110),
+    }),
+    ('/pay/wallet/offer/update', 1000, lambda user, random: {
+        'account_session_token': user['token'],
+        'offer_id': random.choice(user['offers_ids']),
+        'rate': random.randint(90, 110),
+    }),
+    ('/pay/offers/search', 1000, lambda user, random: {
+        'currency': 'usd',
+        'offer_type': random.choice((OfferType.input, OfferType.output)),
+        'value': random.choice((500, 1000, 2500, 5000)),
+    }),
+    ('/pay/book/get', 1000, lambda user, random: {
+        'system_name': random.choice(('card', 'bank', 'cash')),
+        'offer_type': random.choice((OfferType.input, OfferType.output)),
+    }),
+)
+
+
+def percentile(values: list, rate: float):
+    return values[min(len(values) - 1, int(len(values) * rate))]
+
+
+def scenario_run(client, databases: list, path: str, requests: int, payload, users: list, random: Random):
+    latencies, errors, queries = [], 0, 0
+    for _ in range(requests):
+        json = payload(random.choice(users), random)
+        queries_start = sum(database.queries for database in databases)
+        time_start = perf_counter()
+        response = client.get(path, json=json)
+        latencies.append(perf_counter() - time_start)
+        queries += sum(database.queries for database in databases) - queries_start
+        if response.status_code != 200 or response.get_json()['status'] != 'successful':
+            errors += 1
+    time_total = sum(latencies)
+    latencies.sort()
+    return {
+        'path': path,
+        'requests': requests,
+        'errors': errors,
+        'requests_per_second': requests / time_total,
+        'latency_p50_ms': percentile(latencies, 0.50) * 1000,
+        'latency_p95_ms': percentile(latencies, 0.95) * 1000,
+        'latency_p99_ms': percentile(latencies, 0.99) * 1000,
+        'queries_per_request': queries / requests,
+    }
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--accounts', type=int, default=1000)
+    parser.add_argument('--offers', type=int, default=20, help='offers per wallet')
+    parser.add_argument('--actions', type=int, default=200, help='wallet actions per wallet')
+    parser.add_argument('--scale', type=float, default=1, help='multiplier of the requests per endpoint')
+    parser.add_argument('--output', default='benchmarks_endpoints.json')
+    args = parser.parse_args()
+
+    # Keep the N+1 warnings, skip the per-request log lines
+    getLogger('app.queries').setLevel(WARNING)
+    databases = databases_standin()
+    migrate()
+    app = app_create()
+    users = seed(accounts=args.accounts, offers=args.offers, actions=args.actions)
+    client = app.test_client()
+    random = Random(0)
+
+    results = []
+    for path, requests, payload in scenarios:
+        result = scenario_run(
+            client=client,
+            databases=databases,
+            path=path,
+            requests=max(1, int(requests * args.scale)),
+            payload=payload,
+            users=users,
+            random=random,
+        )
+        results.append(result)
+        print('{path}: {requests_per_second:.0f} req/s, p50 {latency_p50_ms:.2f} ms, p95 {latency_p95_ms:.2f} ms, '
+              'p99 {latency_p99_ms:.2f} ms, {queries_per_request:.1f} queries/request, {errors} errors'.format(
+                  **result))
+
+    with open(args.output, 'w') as file:
+        file.write(dumps({
+            'datetime': datetime.now(timezone.utc).isoformat(),
+            'python': python_version(),
+            'seed': {'accounts': args.accounts, 'offers': args.offers, 'actions': args.actions},
+            'endpoints': results,
+        }, indent=2))
+    print('Results written to {output}'.format(output=args.output))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+#
+# (c) 2023, Yegor Yakubovich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+# Streaming export of a long wallet history on the local database stand-in: python -m benchmarks.export
+# Reports rows/s and the peak of memory allocated while the response is consumed, which must not grow with the
+# number of rows
+
+
+from argparse import ArgumentParser
+from datetime import datetime, timezone
+from json import dumps
+from logging import getLogger, WARNING
+from time import perf_counter
+from tracemalloc import get_traced_memory, start, stop
+
+from app import app_create
+from app.database.pay.models import WalletAction, database_pay
+from benchmarks.database import databases_standin, standin_seed
+from benchmarks.endpoints import rows_insert
+from migrate import migrate
+
+
+def seed(actions: int):
+    (token,), wallet, _ = standin_seed(username='benchmark_export')
+    now = datetime.now(timezone.utc)
+    with database_pay.atomic():
+        for number in range(0, actions, 10000):
+            rows_insert(WalletAction, [
+                {
+                    'wallet': wallet.id,
+                    'account_session_id': 0,
+                    'action': 'benchmark',
+                    'data': dumps({'number': number + index}),
+                    'datetime': now,
+                } for index in range(min(10000, actions - number))
+            ])
+    return token
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--actions', type=int, default=1000000)
+    parser.add_argument('--gzip', action='store_true')
+    args = parser.parse_args()
+
+    getLogger('app.queries').setLevel(WARNING)
+    databases_standin()
+    migrate()
+    app = app_create()
+    token = seed(actions=args.actions)
+    client = app.test_client()
+
+    start()
+    time_start = perf_counter()
+    response = client.get(
+        '/pay/wallet/actions/export',
+        json={'account_session_token': token, 'gzip': args.gzip},
+        buffered=False,
+    )
+    size, lines = 0, 0
+    for chunk in response.response:
+        size += len(chunk)
+        lines += chunk.count(b'\n')
+    response.close()
+    time_total = perf_counter() - time_start
+    _, memory_peak = get_traced_memory()
+    stop()
+
+    print('{actions} actions: {time:.2f} s, {rate:.0f} rows/s, {size:.1f} MB{gzip}, memory peak {memory:.1f} MB'.format(
+        actions=args.actions,
+        time=time_total,
+        rate=args.actions / time_total,
+        size=size / 1024 / 1024,
+        gzip=' gzip' if args.gzip else ', {lines} lines'.format(lines=lines),
+        memory=memory_peak / 1024 / 1024,
+    ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+#
+# (c) 2023, Yegor Yakubovich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+# Serialisation of a 1,000-offer response with Flask's default JSON provider and with JSONProviderFast:
+# python -m benchmarks.json_response
+
+
+from datetime import datetime, timezone
+from timeit import repeat
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from app.functions.data_output import data_output, ResponseStatus
+from app.functions.json_provider import JSONProviderFast, orjson
+
+
+def payload_create(count: int = 1000):
+    return data_output(
+        status=ResponseStatus.successful,
+        page=1,
+        after=None,
+        wallet_offers=[
+            {
+                'id': id_,
+                'type': 'output',
+                'system': {
+                    'currency': {
+                        'name': 'usd',
+                        'description': 'US dollar',
+                    },
+                    'name': 'card',
+                    'description': 'Bank card',
+                },
+                'value_from': 1000,
+                'value_to': 10000000,
+                'rate': 100 + id_,
+                'updated_datetime': datetime.now(timezone.utc),
+                'active': True,
+            } for id_ in range(count)
+        ],
+    )
+
+
+def main(number: int = 50):
+    app = Flask(__name__)
+    payload = payload_create()
+    providers = (
+        ('flask default', DefaultJSONProvider(app)),
+        ('fast ({encoder})'.format(encoder='orjson' if orjson else 'stdlib'), JSONProviderFast(app)),
+    )
+    with app.app_context():
+        for name, provider in providers:
+            timing = min(repeat(lambda: provider.response(payload), number=number, repeat=5)) / number
+            print('{name}: {timing:.2f} ms per response'.format(name=name, timing=timing * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+#
+# (c) 2023, Yegor Yakubovich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+# Per-request cost of recording metrics: python -m benchmarks.metrics
+
+
+from timeit import repeat
+
+from app.functions.metrics import Metrics
+
+
+def main(number: int = 200000):
+    metrics = Metrics()
+    timing = min(repeat(
+        lambda: metrics.record(endpoint='benchmark', duration=0.012, status_http=200, status='successful'),
+        number=number,
+        repeat=5,
+    )) / number
+    print('record: {timing:.2f} us per request'.format(timing=timing * 1000000))
+
+
+if __name__ == '__main__':
+    main()
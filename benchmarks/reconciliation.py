@@ -0,0 +1,116 @@
+#
+# (c) 2023, Yegor Yakubovich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+# Reconciliation throughput on the local database stand-in: python -m benchmarks.reconciliation
+# Seeds wallets whose balance actions chain correctly, breaks a few of them, then times a full audit, an
+# incremental run with nothing new and an incremental run after more actions
+
+
+from argparse import ArgumentParser
+from datetime import datetime, timezone
+from io import StringIO
+from json import dumps, loads
+from time import perf_counter
+
+from app.database.pay.models import Wallet, WalletAction, WalletActions, database_pay
+from app.functions.reconciliation import reconciliation_run
+from benchmarks.database import databases_standin
+from benchmarks.endpoints import rows_insert
+from migrate import migrate
+
+
+def actions_create(wallets_ids: list, states: dict, actions: int, now: datetime):
+    rows = []
+    for wallet_id in wallets_ids:
+        balance, balance_frozen = states[wallet_id]
+        for number in range(actions):
+            frozen = number % 7 + 1
+            rows.append({
+                'wallet': wallet_id,
+                'account_session_id': 0,
+                'action': WalletActions.balance_frozen,
+                'data': dumps({
+                    'reason': WalletActions.offer_create,
+                    'offer_id': number,
+                    'balance_before': balance,
+                    'balance_frozen_before': balance_frozen,
+                    'frozen': frozen,
+                    'balance': balance - frozen,
+                    'balance_frozen': balance_frozen + frozen,
+                }),
+                'datetime': now,
+            })
+            balance, balance_frozen = balance - frozen, balance_frozen + frozen
+        states[wallet_id] = (balance, balance_frozen)
+    rows_insert(WalletAction, rows)
+    for wallet_id, (balance, balance_frozen) in states.items():
+        Wallet.update(balance=balance, balance_frozen=balance_frozen).where(Wallet.id == wallet_id).execute()
+
+
+def run(name: str, incremental: bool, processes: int, chunk: int):
+    report = StringIO()
+    time_start = perf_counter()
+    totals = reconciliation_run(report=report, incremental=incremental, processes=processes, chunk=chunk)
+    time_total = perf_counter() - time_start
+    print('{name}: {time:.2f} s, {rate:.0f} actions/s, {wallets} wallets, {actions} actions, {checkpoints} '
+          'checkpoints, {mismatches} mismatches'.format(
+              name=name,
+              time=time_total,
+              rate=totals['actions'] / time_total,
+              **totals,
+          ))
+    return [loads(line) for line in report.getvalue().splitlines()]
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--wallets', type=int, default=2000)
+    parser.add_argument('--actions', type=int, default=100, help='balance actions per wallet')
+    parser.add_argument('--broken', type=int, default=5, help='wallets whose balance is changed without an action')
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--chunk', type=int, default=250)
+    args = parser.parse_args()
+
+    databases_standin()
+    migrate()
+    now = datetime.now(timezone.utc)
+    with database_pay.connection_context():
+        rows_insert(Wallet, [{'balance': 10 ** 9, 'balance_frozen': 0} for _ in range(args.wallets)])
+        wallets_ids = [wallet.id for wallet in Wallet.select(Wallet.id).order_by(Wallet.id)]
+        states = {wallet_id: (10 ** 9, 0) for wallet_id in wallets_ids}
+        actions_create(wallets_ids=wallets_ids, states=states, actions=args.actions, now=now)
+        broken = wallets_ids[::max(1, len(wallets_ids) // args.broken)][:args.broken]
+        Wallet.update(balance=Wallet.balance + 1).where(Wallet.id.in_(broken)).execute()
+
+    mismatches = run(name='full', incremental=False, processes=args.processes, chunk=args.chunk)
+    if sorted(mismatch['wallet_id'] for mismatch in mismatches) != sorted(broken):
+        raise AssertionError('Mismatches {mismatches}, broken wallets {broken}'.format(
+            mismatches=mismatches,
+            broken=broken,
+        ))
+    run(name='incremental, nothing new', incremental=True, processes=args.processes, chunk=args.chunk)
+
+    with database_pay.connection_context():
+        Wallet.update(balance=Wallet.balance - 1).where(Wallet.id.in_(broken)).execute()
+        actions_create(wallets_ids=wallets_ids, states=states, actions=max(1, args.actions // 10), now=now)
+    mismatches = run(name='incremental, new actions', incremental=True, processes=args.processes, chunk=args.chunk)
+    if mismatches:
+        raise AssertionError('Unexpected mismatches {mismatches}'.format(mismatches=mismatches))
+
+
+if __name__ == '__main__':
+    main()
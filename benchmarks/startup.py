@@ -0,0 +1,82 @@
+#
+# (c) 2023, Yegor Yakubovich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+# Worker cold start: python -m benchmarks.startup
+# Import time per package in a fresh interpreter (python -X importtime), then app_create() against the
+# local database stand-in, which must not issue any DDL
+
+
+from argparse import ArgumentParser
+from collections import Counter
+from subprocess import run
+from sys import executable
+from time import perf_counter
+
+
+def imports_measure(module: str):
+    process = run(
+        [executable, '-X', 'importtime', '-c', 'import {module}'.format(module=module)],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    # Self time summed per distribution, and per module of the app itself
+    packages = Counter()
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_time, _, name = line[len('import time:'):].split('|')
+        name = name.strip().split('.')
+        packages['.'.join(name[:2] if name[0] == 'app' else name[:1])] += int(self_time)
+    return packages
+
+
+def app_create_measure():
+    from benchmarks.database import databases_standin
+    from migrate import migrate
+
+    databases = databases_standin()
+    migrate()
+    queries = sum(database.queries for database in databases)
+
+    from app import app_create
+    time_start = perf_counter()
+    app_create()
+    time_app_create = perf_counter() - time_start
+    return time_app_create, sum(database.queries for database in databases) - queries
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--module', default='app.blueprints')
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    imports = imports_measure(module=args.module)
+    print('import {module}: {total:.1f} ms'.format(
+        module=args.module,
+        total=sum(imports.values()) / 1000,
+    ))
+    for name, self_time in imports.most_common(args.top):
+        print('  {self_time:8.1f} ms  {name}'.format(self_time=self_time / 1000, name=name))
+
+    time_app_create, queries = app_create_measure()
+    print('app_create: {time:.1f} ms, {queries} queries'.format(time=time_app_create * 1000, queries=queries))
+
+
+if __name__ == '__main__':
+    main()
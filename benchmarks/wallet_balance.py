@@ -0,0 +1,114 @@
+#
+# (c) 2023, Yegor Yakubovich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+# Concurrency stress of the conditional wallet balance updates: python -m benchmarks.wallet_balance --standin
+# Many threads freeze, unfreeze, credit and debit one wallet. The wallet must never go negative and
+# the final balances must match the sum of the updates that were reported as applied. --configured runs against
+# the database of config.ini instead, with a wallet created for the run and deleted afterwards
+
+
+from argparse import ArgumentParser
+from random import Random
+from threading import Thread
+from time import perf_counter
+
+from app.database.pay import Wallet
+from app.database.pay.models import database_pay
+
+
+def worker(wallet_id: int, operations: int, seed: int, results: list):
+    random = Random(seed)
+    wallet = Wallet(id=wallet_id)
+    balance, balance_frozen, applied_count = 0, 0, 0
+    with database_pay.connection_context():
+        for _ in range(operations):
+            value = random.randint(1, 100)
+            operation = random.choice(('freeze', 'unfreeze', 'credit', 'debit'))
+            result = getattr(wallet, 'balance_{operation}'.format(operation=operation))(value=value)
+            if not result.applied:
+                continue
+            applied_count += 1
+            if result.balance < 0 or result.balance_frozen < 0:
+                raise AssertionError('Wallet {id} went negative: {result}'.format(id=wallet_id, result=result))
+            balance += {'freeze': -value, 'unfreeze': value, 'credit': value, 'debit': -value}[operation]
+            balance_frozen += {'freeze': value, 'unfreeze': -value}.get(operation, 0)
+    results.append((balance, balance_frozen, applied_count))
+
+
+def stress(threads: int, operations: int, balance_start: int):
+    with database_pay.connection_context():
+        wallet = Wallet.create(balance=balance_start, balance_frozen=0)
+    try:
+        results = []
+        workers = [
+            Thread(target=worker, args=(wallet.id, operations, seed, results)) for seed in range(threads)
+        ]
+        time_start = perf_counter()
+        [worker_.start() for worker_ in workers]
+        [worker_.join() for worker_ in workers]
+        time_total = perf_counter() - time_start
+        with database_pay.connection_context():
+            wallet = Wallet.get_by_id(wallet.id)
+    finally:
+        with database_pay.connection_context():
+            Wallet.delete().where(Wallet.id == wallet.id).execute()
+    return wallet, results, time_total
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--operations', type=int, default=500, help='balance updates per thread')
+    parser.add_argument('--balance_start', type=int, default=1000)
+    database = parser.add_mutually_exclusive_group(required=True)
+    database.add_argument('--standin', action='store_true', help='use the local database stand-in')
+    database.add_argument('--configured', action='store_true', help='use the database of config.ini')
+    args = parser.parse_args()
+
+    if args.standin:
+        from benchmarks.database import databases_standin
+        from migrate import migrate
+        databases_standin()
+        migrate()
+
+    wallet, results, time_total = stress(
+        threads=args.threads,
+        operations=args.operations,
+        balance_start=args.balance_start,
+    )
+    balance_expected = args.balance_start + sum(result[0] for result in results)
+    balance_frozen_expected = sum(result[1] for result in results)
+    applied = sum(result[2] for result in results)
+    print('{updates} updates, {applied} applied, {rate:.0f} updates/s'.format(
+        updates=args.threads * args.operations,
+        applied=applied,
+        rate=args.threads * args.operations / time_total,
+    ))
+    if len(results) != args.threads or \
+            (wallet.balance, wallet.balance_frozen) != (balance_expected, balance_frozen_expected):
+        raise AssertionError('Wallet balances {balances} do not match the applied updates {expected}'.format(
+            balances=(wallet.balance, wallet.balance_frozen),
+            expected=(balance_expected, balance_frozen_expected),
+        ))
+    print('balance {balance}, balance_frozen {balance_frozen}: consistent'.format(
+        balance=wallet.balance,
+        balance_frozen=wallet.balance_frozen,
+    ))
+
+
+if __name__ == '__main__':
+    main()
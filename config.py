@@ -28,5 +28,38 @@ DB_HOST = config_db.get('host')
 DB_PORT = config_db.getint('port')
 DB_USER = config_db.get('user')
 DB_PASSWORD = config_db.get('password')
+DB_POOL_MAX_CONNECTIONS = config_db.getint('pool_max_connections', fallback=8)
+DB_POOL_STALE_TIMEOUT = config_db.getint('pool_stale_timeout', fallback=300)
+DB_POOL_TIMEOUT = config_db.getint('pool_timeout', fallback=10)
 SALT_PASSWORDS = config_cryptography.get('salt_passwords')
 SALT_TOKENS = config_cryptography.get('salt_tokens')
+CACHE_SESSIONS_TTL = config.getint('cache', 'sessions_ttl', fallback=300)
+CACHE_SESSIONS_ITEMS = config.getint('cache', 'sessions_items', fallback=10000)
+CACHE_REFERENCES_TTL = config.getint('cache', 'references_ttl', fallback=60)
+CACHE_OFFERS_SEARCH_TTL = config.getint('cache', 'offers_search_ttl', fallback=2)
+CACHE_OFFERS_SEARCH_ITEMS = config.getint('cache', 'offers_search_items', fallback=1024)
+PASSWORDS_ITERATIONS = config.getint('passwords', 'iterations', fallback=131072)
+PASSWORDS_PROCESSES = config.getint('passwords', 'processes', fallback=1)
+PASSWORDS_QUEUE = config.getint('passwords', 'queue', fallback=2)
+QUERIES_LOG = config.getboolean('logging', 'queries', fallback=False)
+QUERIES_REPEATED_MAX = config.getint('logging', 'queries_repeated_max', fallback=3)
+QUERIES_SLOW_MS = config.getint('logging', 'queries_slow_ms', fallback=1000)
+PAGINATION_LIMIT = config.getint('pagination', 'limit', fallback=10)
+PAGINATION_LIMIT_MAX = config.getint('pagination', 'limit_max', fallback=100)
+METRICS_PUBLISH_INTERVAL = config.getfloat('metrics', 'publish_interval', fallback=1.0)
+ORDER_BOOK_RELOAD_INTERVAL = config.getfloat('order_book', 'reload_interval', fallback=300.0)
+ORDER_BOOK_CHANGES = config.getint('order_book', 'changes', fallback=4096)
+ORDER_BOOK_DEPTH = config.getint('order_book', 'depth', fallback=10)
+ORDER_BOOK_DEPTH_MAX = config.getint('order_book', 'depth_max', fallback=50)
+DEALS_CANDIDATES = config.getint('deals', 'candidates', fallback=8)
+RECONCILIATION_PROCESSES = config.getint('reconciliation', 'processes', fallback=4)
+RECONCILIATION_CHUNK = config.getint('reconciliation', 'chunk', fallback=10000)
+ARCHIVE_DIRECTORY = config.get('archive', 'directory', fallback='archive')
+ARCHIVE_MONTHS_HOT = config.getint('archive', 'months_hot', fallback=3)
+ARCHIVE_DELETE_DELAY = config.getint('archive', 'delete_delay', fallback=60)
+ARCHIVE_BLOCK_ROWS = config.getint('archive', 'block_rows', fallback=1000)
+EXPORT_CHUNK = config.getint('export', 'chunk', fallback=1000)
+BATCH_OPERATIONS_MAX = config.getint('batch', 'operations_max', fallback=100)
+DEVICES_SEEN_ITEMS = config.getint('devices', 'seen_items', fallback=100000)
+DEVICES_FLUSH_INTERVAL = config.getfloat('devices', 'flush_interval', fallback=1.0)
+DEVICES_BATCH = config.getint('devices', 'batch', fallback=500)
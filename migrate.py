@@ -0,0 +1,50 @@
+#
+# (c) 2023, Yegor Yakubovich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+# One-shot schema command, run once per deploy before the workers start: python migrate.py [check]
+
+
+from sys import argv, exit
+
+from app.database import databases_close, tables_create
+from app.database.explain import queries_hot_check
+from app.database.migrations import migrations_run
+
+
+def migrate():
+    tables_create()
+    for database, version, name in migrations_run():
+        print('{database}: migration {version} {name} applied'.format(database=database, version=version, name=name))
+    databases_close()
+
+
+def check():
+    failures = queries_hot_check()
+    databases_close()
+    for name, indexes_expected, indexes in failures:
+        print('{name}: expected one of indexes {indexes_expected}, used {indexes}'.format(
+            name=name,
+            indexes_expected=indexes_expected,
+            indexes=indexes,
+        ))
+    return not failures
+
+
+if __name__ == "__main__":
+    if argv[1:] == ['check']:
+        exit(0 if check() else 1)
+    migrate()
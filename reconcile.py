@@ -0,0 +1,49 @@
+#
+# (c) 2023, Yegor Yakubovich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+# Wallet balances against the action log: python reconcile.py [full] [--report reconciliation.ndjson]
+# Incremental by default, from the last checkpoint of every wallet. full replays the whole history, nightly
+
+
+from argparse import ArgumentParser
+from sys import exit
+
+from app.functions.reconciliation import reconciliation_run
+from config import RECONCILIATION_PROCESSES, RECONCILIATION_CHUNK
+
+
+def reconcile():
+    parser = ArgumentParser()
+    parser.add_argument('mode', nargs='?', choices=('incremental', 'full'), default='incremental')
+    parser.add_argument('--report', default='reconciliation.ndjson')
+    parser.add_argument('--processes', type=int, default=RECONCILIATION_PROCESSES)
+    parser.add_argument('--chunk', type=int, default=RECONCILIATION_CHUNK, help='wallets per task')
+    args = parser.parse_args()
+
+    with open(args.report, 'w') as report:
+        totals = reconciliation_run(
+            report=report,
+            incremental=args.mode == 'incremental',
+            processes=args.processes,
+            chunk=args.chunk,
+        )
+    print('{wallets} wallets, {actions} actions, {checkpoints} checkpoints, {mismatches} mismatches'.format(**totals))
+    return not totals['mismatches']
+
+
+if __name__ == "__main__":
+    exit(0 if reconcile() else 1)
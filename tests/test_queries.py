@@ -0,0 +1,73 @@
+#
+# (c) 2023, Yegor Yakubovich
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+# Queries per request of the offers endpoints on the local database stand-in, run from the project root next to
+# config.ini: python -m unittest tests.test_queries. A page costs the same whatever the number of offers on it
+
+
+from datetime import datetime, timezone
+from logging import getLogger, WARNING
+from re import search
+from unittest import TestCase
+
+from app import app_create
+from app.database.pay.models import Offer, OfferType
+from benchmarks.database import databases_standin, standin_seed
+from migrate import migrate
+
+
+class QueriesTest(TestCase):
+    offers = 25
+
+    @classmethod
+    def setUpClass(cls):
+        getLogger('app.queries').setLevel(WARNING)
+        databases_standin()
+        migrate()
+        (cls.token,), wallet, system = standin_seed(username='test_queries')
+        cls.offers_ids = [
+            Offer.create(
+                type=OfferType.output,
+                wallet=wallet,
+                system=system,
+                system_data='{}',
+                value_from=1,
+                value_to=0,
+                rate=100,
+                updated_datetime=datetime.now(timezone.utc),
+            ).id for _ in range(cls.offers)
+        ]
+        cls.client = app_create().test_client()
+        # Sessions and wallets are cached after the first request of a token
+        cls.queries_count('/account/get')
+
+    @classmethod
+    def queries_count(cls, path: str, **data):
+        response = cls.client.get(path, json={'account_session_token': cls.token, **data})
+        if response.get_json()['status'] != 'successful':
+            raise AssertionError(response.get_json())
+        return int(search(r'"(\d+) queries"', response.headers['Server-Timing']).group(1))
+
+    # The wallet, then the offers joined with their systems and currencies
+    def test_offers_get(self):
+        for limit in (1, 10, 25):
+            self.assertEqual(self.queries_count('/pay/wallet/offers/get', page=1, limit=limit), 2)
+        self.assertEqual(self.queries_count('/pay/wallet/offers/get', page=3, limit=10), 2)
+        self.assertEqual(self.queries_count('/pay/wallet/offers/get', limit=10), 2)
+
+    def test_offer_get(self):
+        self.assertEqual(self.queries_count('/pay/wallet/offer/get', offer_id=self.offers_ids[0]), 2)